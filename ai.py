@@ -9,23 +9,47 @@ AI功能模块：用于分析爬虫数据并发送通知
 import os
 import sys
 import json
-import pandas as pd
-import requests
+import copy
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple, Iterable, Union, BinaryIO, TYPE_CHECKING
+from collections import Counter
+import io
+import csv
 import math
+import heapq
+import operator
+import itertools
 import re
+import random
+import hashlib
+import string
+import time
+import threading
+import functools
+import importlib.util
 import concurrent.futures
 
-# 如果使用OpenAI兼容接口调用Gemini API
-try:
-    from openai import OpenAI
-    HAS_OPENAI = True
-except ImportError:
-    HAS_OPENAI = False
+# pandas、requests和openai导入较慢，在实际用到的函数内延迟导入
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 如果使用OpenAI兼容接口调用Gemini API；这里只检查是否安装，创建客户端时才导入
+HAS_OPENAI = importlib.util.find_spec('openai') is not None
+if not HAS_OPENAI:
     print("警告: openai 库未安装，AI分析功能将不可用")
     print("可通过 pip install openai 安装")
 
+# 优先使用orjson序列化webhook消息，未安装时退回标准库json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# 可选：整表读取时用pyarrow多线程解析TSV；pyarrow导入较慢，这里只检查是否安装
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
 # board_id到中文名称映射
 BOARD_ID_NAME_MAP = {
     # 邮票类
@@ -38,6 +62,253 @@ BOARD_ID_NAME_MAP = {
     "23": "古玩金银铜瓷陶器", "155": "古玩竹木雕漆器", "157": "书报字画", "166": "当代新制玉器", "187": "其它古玩杂件藏品", "198": "历代古玉器"
 }
 
+# 每次AI调用打包的帖子行数，可通过环境变量AI_BATCH_ROWS调整（过大会拉长单次调用耗时）
+BATCH_ROWS = int(os.environ.get('AI_BATCH_ROWS', '100'))
+# 发送给AI的帖子字段
+AI_INPUT_COLUMNS = ['board_id', 'title', 'date']
+# 发送给AI的标题最大长度，超长标题截断以减少输入token
+AI_TITLE_MAX_CHARS = 120
+# Gemini每分钟请求数上限（RPM），请求按此速率均匀发出
+GEMINI_RPM = int(os.environ.get('GEMINI_RPM', '60'))
+# 同时进行的AI调用上限
+AI_MAX_WORKERS = int(os.environ.get('AI_MAX_WORKERS', '16'))
+# 遇到429限流、5xx或网络错误时的最大重试次数
+RATE_LIMIT_RETRIES = 5
+# 重试等待时间上限（秒）
+RETRY_MAX_WAIT = 30
+# 可以重试的HTTP状态码
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+# 单次AI请求的超时时间（秒）
+AI_REQUEST_TIMEOUT = 120
+# 使用的Gemini模型
+GEMINI_MODEL = "gemini-2.5-flash-preview-04-17"
+
+# AI输出中对应输入row_id的列，用于把结果行对应回输入帖子，合并结果时去掉
+ROW_KEY_COLUMN = '行号'
+
+# AI响应缓存目录，相同批次内容直接复用已有结果；设为空字符串则只使用进程内缓存
+AI_CACHE_DIR = os.environ.get('AI_CACHE_DIR', '.ai_cache')
+# 提示词版本号，修改_ANALYSIS_SYSTEM_PROMPT后需同步修改，使旧缓存失效
+PROMPT_VERSION = '3'
+
+# analyze_data读取的帖子字段及其类型，其余列不加载
+POST_COLUMNS = ['title', 'author', 'date', 'board_id', 'replies', 'views']
+POST_DTYPES = {
+    'board_id': 'category',
+    'replies': 'Int32',
+    'views': 'Int32',
+    'title': 'string',
+    'author': 'string'
+}
+# 爬虫输出的日期格式，读取时按固定格式解析
+POST_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 无需AI分析时分块读取的行数
+SUMMARY_CHUNK_ROWS = 50_000
+# 小于该大小且无需AI分析的文件直接用标准库csv处理，不经过pandas
+SMALL_FILE_BYTES = 5_000_000
+# 发送webhook通知的超时时间（秒）
+WEBHOOK_TIMEOUT = 10
+
+# 分析提示词作为system消息发送；内容保持不变以便命中Gemini的隐式前缀缓存
+_ANALYSIS_SYSTEM_PROMPT = """\
+你是收藏品交易帖子的信息提取助手。用户会提供TSV格式的帖子（列：board_id, title, date, row_id），请逐行分析并只输出TSV结果。
+
+规则：
+1. 意图分类：含"收购/求购/求/收/寻"为"收购"；含"出/售/转让/批"为"出售"；意图不明确或买卖混杂为"其他"。
+2. 物品名称：标题中核心、可识别的物品名称。
+3. 价格描述：原文中关于价格的完整说法，如"428元一捆"、"1060出"、"高价求购"、"面议"。
+4. 数值价格：价格描述中的阿拉伯数字，多个用", "分隔；没有数字则留空。
+5. 价格类型："收购价"、"出售价"或"N/A"。
+6. 数量描述：如"一捆"、"5桶"、"整包"、"5-10枚"。
+7. 特征/品相：版本、品相、评级等信息，如"无油"、"小号"、"原桶"、"NGC首日70分"。
+8. 原始标题文本、板块ID、日期、行号照抄输入的title、board_id、date、row_id。
+9. 尽量为每个帖子输出一行，字段无内容时留空。
+
+输出格式：第一行为表头，字段之间用一个制表符分隔，不要输出其他说明文字。
+
+示例：
+```tsv
+原始标题文本	意图分类	物品名称	价格描述	数值价格	价格类型	数量描述	特征/品相	板块ID	日期	行号
+原捆无油一分428元一捆，小号一分698一捆	出售	一分(纸币)	428元一捆, 698一捆	428, 698	出售价	一捆	原捆无油, 小号	11	2025-05-09 14:20:00	0
+980求龙原桶1000枚	收购	龙(币)	980求	980	收购价	1000枚	原桶	9	2025-05-09 14:15:06	1
+```
+"""
+
+# user消息中位于TSV数据之前的固定前缀
+_ANALYSIS_USER_PREFIX = "以下是需要分析的帖子数据（TSV格式）：\n"
+
+@functools.lru_cache(maxsize=None)
+def _get_openai_client(api_key: str) -> Any:
+    """按API密钥复用OpenAI客户端，多个AIAnalyzer实例共享同一连接池"""
+    from openai import OpenAI
+    
+    # 重试统一由_create_completion处理，关闭SDK自带的重试，避免两层退避叠加、速率控制漏算请求
+    return OpenAI(
+        api_key=api_key,
+        base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+        max_retries=0
+    )
+
+# 关键词分类：标签0为"其他"，1为"收购"，2为"出售"
+INTENT_LABELS = ("其他", "收购", "出售")
+BUY_KEYWORDS = ("收购", "求购", "求", "收", "寻")
+SELL_KEYWORDS = ("出", "售", "转让", "批")
+
+def classify_titles(titles: List[str]) -> List[int]:
+    """按关键词判断标题意图，返回标签列表（对应INTENT_LABELS）"""
+    labels = []
+    for title in titles:
+        has_buy = any(kw in title for kw in BUY_KEYWORDS)
+        has_sell = any(kw in title for kw in SELL_KEYWORDS)
+        labels.append(1 if has_buy and not has_sell else 2 if has_sell and not has_buy else 0)
+    return labels
+
+def classify_posts_by_keywords(df: 'pd.DataFrame') -> 'pd.DataFrame':
+    """不调用AI时按关键词给帖子分类，返回列名与AI输出一致的DataFrame"""
+    import pandas as pd
+    
+    titles = df['title'].fillna('').astype(str).tolist()
+    board_ids = df['board_id'].astype(str)
+    return pd.DataFrame({
+        '原始标题文本': titles,
+        '意图分类': [INTENT_LABELS[label] for label in classify_titles(titles)],
+        '板块ID': board_ids.to_numpy(),
+        '板块名称': board_ids.map(BOARD_ID_NAME_MAP).fillna(board_ids).to_numpy(),
+        '日期': df['date'].to_numpy() if 'date' in df.columns else ''
+    })
+
+def write_keyword_analysis(data_file: str, output_file: str) -> int:
+    """
+    未配置AI时按关键词分类全部帖子并写入TSV，逐块读取、逐块写出，内存占用与文件大小无关
+    
+    返回:
+        写入的帖子数
+    """
+    total = 0
+    with open(output_file, 'w', encoding='utf-8', newline='') as out:
+        with _read_posts_c(data_file, chunksize=SUMMARY_CHUNK_ROWS) as reader:
+            for chunk in reader:
+                if chunk.empty:
+                    continue
+                classify_posts_by_keywords(chunk).to_csv(out, sep='\t', index=False, header=total == 0, lineterminator='\n')
+                total += len(chunk)
+    return total
+
+def _read_posts_c(data_file: Union[str, BinaryIO], chunksize: Optional[int] = None) -> Any:
+    """用pandas的C解析器读取帖子TSV，只加载需要的列并在读取时确定类型"""
+    import pandas as pd
+    
+    return pd.read_csv(
+        data_file,
+        sep='\t',
+        usecols=lambda c: c in POST_COLUMNS,
+        dtype=POST_DTYPES,
+        parse_dates=['date'],
+        date_format=POST_DATE_FORMAT,
+        engine='c',
+        chunksize=chunksize
+    )
+
+def _read_posts_pyarrow(path: str) -> 'pd.DataFrame':
+    """用pyarrow解析器读取帖子TSV，列和类型与_read_posts_c保持一致"""
+    import pandas as pd
+    
+    df = pd.read_csv(path, sep='\t', engine='pyarrow')
+    df = df[[col for col in POST_COLUMNS if col in df.columns]]
+    # pyarrow会自动推断类型，字符串列（包括板块ID）先统一转回文本
+    for col, dtype in POST_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if dtype in ('category', 'string') and not pd.api.types.is_object_dtype(df[col]):
+            df[col] = df[col].astype('string')
+        df[col] = df[col].astype(dtype)
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        try:
+            df['date'] = pd.to_datetime(df['date'], format=POST_DATE_FORMAT)
+        except (ValueError, TypeError):
+            # 与C解析器一致，日期解析失败时保留原始文本
+            pass
+    return df
+
+@functools.lru_cache(maxsize=4)
+def _read_tsv_cached(path: str, mtime_ns: int, size: int) -> 'pd.DataFrame':
+    """按(路径, 修改时间, 大小)缓存整表读取结果"""
+    if HAS_PYARROW:
+        try:
+            return _read_posts_pyarrow(path)
+        except Exception as e:
+            print(f"pyarrow读取失败，改用默认解析器: {e}")
+    return _read_posts_c(path)
+
+def _read_tsv(path: str, stat: Optional[os.stat_result] = None) -> 'pd.DataFrame':
+    """
+    一次性读取整个帖子TSV。文件未修改时直接返回上次读取的DataFrame，
+    调用方不要原地修改返回结果。文件不存在时抛出FileNotFoundError。
+    调用方已获取文件信息时可通过stat传入，避免重复stat。
+    """
+    if stat is None:
+        stat = os.stat(path)
+    return _read_tsv_cached(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def _has_informative_titles(df: 'pd.DataFrame') -> bool:
+    """批次中是否至少有一个非空标题"""
+    if 'title' not in df.columns:
+        return False
+    return bool((df['title'].astype('string').str.strip().str.len() > 0).any())
+
+# 进程内的AI响应缓存，重试时无需再访问磁盘
+_RESPONSE_CACHE: Dict[str, str] = {}
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+def _response_cache_key(user_content: str) -> str:
+    """根据提示词版本、模型和批次内容计算缓存键"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(PROMPT_VERSION.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(GEMINI_MODEL.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(user_content.encode('utf-8'))
+    return digest.hexdigest()
+
+def _load_cached_response(key: str) -> Optional[str]:
+    """依次查找进程内缓存和磁盘缓存，未命中时返回None"""
+    with _RESPONSE_CACHE_LOCK:
+        cached = _RESPONSE_CACHE.get(key)
+    if cached is not None or not AI_CACHE_DIR:
+        return cached
+    path = os.path.join(AI_CACHE_DIR, f"{key}.txt")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = f.read()
+    except OSError:
+        return None
+    try:
+        # 命中时刷新修改时间，工作流按修改时间清理长期未命中的条目
+        os.utime(path)
+    except OSError:
+        pass
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[key] = cached
+    return cached
+
+def _store_cached_response(key: str, ai_output: str):
+    """保存AI响应到进程内缓存和磁盘缓存，写盘失败不影响分析"""
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[key] = ai_output
+    if not AI_CACHE_DIR:
+        return
+    path = os.path.join(AI_CACHE_DIR, f"{key}.txt")
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(AI_CACHE_DIR, exist_ok=True)
+        # 先写临时文件再替换，避免并发线程读到写了一半的缓存
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(ai_output)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"写入AI响应缓存失败: {e}")
+
+
 class AIAnalyzer:
     """使用AI分析爬虫数据并生成洞察"""
     
@@ -54,10 +325,12 @@ class AIAnalyzer:
         
         self.client = None
         if HAS_OPENAI and self.api_key:
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-            )
+            self.client = _get_openai_client(self.api_key)
+        
+        # 限制并发请求数，并按GEMINI_RPM控制请求发出间隔
+        self._semaphore = threading.Semaphore(AI_MAX_WORKERS)
+        self._rate_lock = threading.Lock()
+        self._next_request_time = 0.0
     
     def analyze_data(self, data_file: str) -> Tuple[Dict[str, Any], Optional[str]]:
         """
@@ -67,73 +340,206 @@ class AIAnalyzer:
             data_file: TSV数据文件路径
             
         返回:
-            (数据摘要, AI分析结果)
+            (数据摘要, AI分析结果)；未配置AI时AI分析结果为None
         """
-        # 检查文件是否存在
-        if not os.path.exists(data_file):
+        # 读取TSV文件并做基本统计分析：只获取一次文件信息并据此选择读取方式，每条路径只读一遍文件
+        # （文件不存在时由FileNotFoundError处理）
+        try:
+            stat = os.stat(data_file)
+            if self.client:
+                # AI分析需要全部帖子，一次性读入
+                df = _read_tsv(data_file, stat)
+                print(f"成功读取数据文件，包含 {len(df)} 条记录，占用内存 {df.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB")
+                summary = self._generate_data_summary(df)
+            else:
+                with open(data_file, 'rb') as fh:
+                    if stat.st_size < SMALL_FILE_BYTES:
+                        # 小文件且无需AI时走标准库快速路径，跳过pandas
+                        return self._analyze_small(fh)
+                    # 无AI时分块读取，内存占用与文件大小无关
+                    with self._read_posts(fh, chunksize=SUMMARY_CHUNK_ROWS) as reader:
+                        summary = self._generate_data_summary(reader)
+                print(f"成功读取数据文件，包含 {summary['total_posts']} 条记录")
+        except FileNotFoundError:
             print(f"错误: 文件 {data_file} 不存在")
             return {}, None
-        
-        # 读取TSV文件
-        try:
-            df = pd.read_csv(data_file, sep='\t')
-            print(f"成功读取数据文件，包含 {len(df)} 条记录")
         except Exception as e:
             print(f"读取文件时出错: {e}")
             return {}, None
         
-        # 基本统计分析
-        summary = self._generate_data_summary(df)
+        # 快速路径之外才需要pandas
+        import pandas as pd
         
-        # 使用AI分析数据
         ai_analysis = None
+        
+        # 使用AI分析数据：每BATCH_ROWS条帖子打包为一次调用
         if self.client:
-            ai_analysis = self._get_ai_insights(df)
+            chunks = []
+            for start in range(0, len(df), BATCH_ROWS):
+                chunks.append(df.iloc[start:start + BATCH_ROWS])
+            
+            frames = []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=AI_MAX_WORKERS) as executor:
+                futures = [executor.submit(self._call_one, chunk) for chunk in chunks]
+                # 按提交顺序收集，保证结果顺序与原数据一致
+                for idx, future in enumerate(futures):
+                    frame = future.result()
+                    if frame is None:
+                        print(f"第{idx+1}/{len(chunks)}批AI分析无有效结果，跳过")
+                        continue
+                    frames.append(frame)
+            
+            if frames:
+                ai_df = insert_board_names(pd.concat(frames, ignore_index=True).drop(columns=[ROW_KEY_COLUMN], errors='ignore'))
+                ai_analysis = ai_df.to_csv(sep='\t', index=False)
             
         return summary, ai_analysis
     
-    def _generate_data_summary(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """生成数据摘要统计"""
-        total_posts = len(df)
-        if total_posts == 0:
-            return {"total_posts": 0}
+    def _analyze_small(self, fh: BinaryIO) -> Tuple[Dict[str, Any], None]:
+        """
+        小文件快速路径：用标准库csv单遍读取并统计，结果与pandas路径一致
         
-        # 各板块帖子数量
-        board_counts = df['board_id'].value_counts().to_dict()
+        参数:
+            fh: 以二进制模式打开的TSV文件
+            
+        返回:
+            (数据摘要, None)
+        """
+        reader = csv.DictReader(io.TextIOWrapper(fh, encoding='utf-8-sig', newline=''), delimiter='\t')
+        available_columns = [col for col in POST_COLUMNS if col in (reader.fieldnames or [])]
         
-        # 尝试转换日期列
-        try:
-            df['date'] = pd.to_datetime(df['date'])
-            df_sorted = df.sort_values('date', ascending=False)
+        posts = []
+        board_counter = Counter()
+        dates_usable = 'date' in available_columns
+        for row in reader:
+            post = {col: row.get(col) or '' for col in available_columns}
+            board_counter[post.get('board_id', '')] += 1
+            for col in ('replies', 'views'):
+                if col in post:
+                    post[col] = int(post[col]) if post[col] else None
+            if dates_usable and post['date']:
+                try:
+                    post['date'] = datetime.strptime(post['date'], POST_DATE_FORMAT)
+                except ValueError:
+                    dates_usable = False
+            posts.append(post)
+        print(f"成功读取数据文件，包含 {len(posts)} 条记录")
+        
+        if not posts:
+            return {"total_posts": 0}, None
+        
+        def to_tsv(selected: List[Dict[str, Any]]) -> str:
+            """按available_columns将帖子写成带表头的TSV"""
+            buf = io.StringIO()
+            writer = csv.writer(buf, delimiter='\t', lineterminator='\n')
+            writer.writerow(available_columns)
+            for post in selected:
+                writer.writerow([
+                    value.strftime(POST_DATE_FORMAT) if isinstance(value, datetime) else ('' if value is None else value)
+                    for value in (post[col] for col in available_columns)
+                ])
+            return buf.getvalue()
+        
+        # 日期、回复、浏览的前K条（heapq.nlargest对并列项保持原顺序，与DataFrame.nlargest一致）
+        dated = [post for post in posts if isinstance(post.get('date'), datetime)] if dates_usable else []
+        if dated:
+            recent = heapq.nlargest(5, dated, key=operator.itemgetter('date'))
             date_range = [
-                df['date'].min().strftime('%Y-%m-%d'), 
-                df['date'].max().strftime('%Y-%m-%d')
+                min(post['date'] for post in dated).strftime('%Y-%m-%d'),
+                max(post['date'] for post in dated).strftime('%Y-%m-%d')
             ]
-        except:
-            # 如果日期转换失败，就使用原始数据
-            df_sorted = df
+        else:
+            recent = posts[:5]
             date_range = ["未知", "未知"]
         
-        # 获取最近的帖子
-        recent_columns = ['title', 'author', 'date', 'board_id', 'replies', 'views']
-        available_columns = [col for col in recent_columns if col in df.columns]
-        recent_posts = df_sorted.head(5)[available_columns].to_dict('records')
+        def top_by(col: str) -> str:
+            if col not in available_columns:
+                return ""
+            candidates = [post for post in posts if post[col] is not None]
+            return to_tsv(heapq.nlargest(3, candidates, key=operator.itemgetter(col)))
         
-        # 最多回复/浏览的帖子
-        if 'replies' in df.columns:
-            most_replies = df.sort_values('replies', ascending=False).head(3)[available_columns].to_dict('records')
-        else:
-            most_replies = []
+        summary = {
+            "total_posts": len(posts),
+            "board_distribution": dict(sorted(board_counter.items())),
+            "recent_posts": to_tsv(recent),
+            "most_replied": top_by('replies'),
+            "most_viewed": top_by('views'),
+            "date_range": date_range
+        }
+        
+        return summary, None
+    
+    def _read_posts(self, data_file: Union[str, BinaryIO], chunksize: Optional[int] = None) -> Any:
+        """读取帖子TSV，只加载需要的列并在读取时确定类型；指定chunksize时返回分块迭代器"""
+        return _read_posts_c(data_file, chunksize)
+    
+    def _generate_data_summary(self, data: Union['pd.DataFrame', Iterable['pd.DataFrame']]) -> Dict[str, Any]:
+        """
+        生成数据摘要统计
+        
+        参数:
+            data: 帖子DataFrame，或按块读取的DataFrame迭代器（逐块累计，不合并全表）
+        """
+        import pandas as pd
+        
+        if isinstance(data, pd.DataFrame):
+            data = [data]
+        
+        total_posts = 0
+        board_counter = Counter()
+        dates_usable = True
+        date_min = date_max = None
+        first_rows = recent_df = replies_df = views_df = None
+        
+        for chunk in data:
+            if chunk.empty:
+                continue
+            total_posts += len(chunk)
+            if first_rows is None:
+                first_rows = chunk.head(5)
+            
+            # 各板块帖子数量
+            board_counter.update(self._count_boards(chunk['board_id']))
+            
+            # 日期列在读取时已解析，解析失败时保持原始文本
+            if dates_usable and 'date' in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk['date']):
+                chunk_min, chunk_max = chunk['date'].min(), chunk['date'].max()
+                if pd.notna(chunk_min):
+                    date_min = chunk_min if date_min is None else min(date_min, chunk_min)
+                    date_max = chunk_max if date_max is None else max(date_max, chunk_max)
+                    recent_df = self._merge_top(recent_df, chunk, 'date', 5)
+            else:
+                dates_usable = False
             
-        if 'views' in df.columns:
-            most_views = df.sort_values('views', ascending=False).head(3)[available_columns].to_dict('records')
+            # 最多回复/浏览的帖子（nlargest只做部分选择，避免整表排序）
+            if 'replies' in chunk.columns and pd.api.types.is_numeric_dtype(chunk['replies']):
+                replies_df = self._merge_top(replies_df, chunk, 'replies', 3)
+            if 'views' in chunk.columns and pd.api.types.is_numeric_dtype(chunk['views']):
+                views_df = self._merge_top(views_df, chunk, 'views', 3)
+        
+        if total_posts == 0:
+            return {"total_posts": 0}
+        
+        if dates_usable and date_min is not None:
+            date_range = [date_min.strftime('%Y-%m-%d'), date_max.strftime('%Y-%m-%d')]
         else:
-            most_views = []
+            # 如果日期不可用，就使用原始数据
+            recent_df = first_rows
+            date_range = ["未知", "未知"]
+        
+        # 最近/最多回复/最多浏览的帖子直接序列化为TSV文本
+        available_columns = [col for col in POST_COLUMNS if col in first_rows.columns]
+        recent_posts = recent_df[available_columns].to_csv(sep='\t', index=False)
+        most_replies = replies_df[available_columns].to_csv(sep='\t', index=False) if replies_df is not None else ""
+        most_views = views_df[available_columns].to_csv(sep='\t', index=False) if views_df is not None else ""
+        
+        # 板块分布保留为按帖子数降序排列的Series，通知中直接取前几项
+        board_distribution = pd.Series(board_counter, dtype='int64').sort_values(ascending=False, kind='stable')
         
         # 汇总信息
         summary = {
             "total_posts": total_posts,
-            "board_distribution": board_counts,
+            "board_distribution": board_distribution,
             "recent_posts": recent_posts,
             "most_replied": most_replies,
             "most_viewed": most_views,
@@ -142,128 +548,264 @@ class AIAnalyzer:
         
         return summary
     
-    def _get_ai_insights(self, df: pd.DataFrame) -> Optional[str]:
-        """使用Gemini API获取数据洞察"""
+    @staticmethod
+    def _count_boards(board_ids: 'pd.Series') -> Dict[Any, int]:
+        """统计各板块帖子数量，board_id为category时直接对类别编码计数"""
+        import pandas as pd
+        
+        if isinstance(board_ids.dtype, pd.CategoricalDtype):
+            categories = board_ids.cat.categories
+            import numpy as np
+            
+            codes = board_ids.cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+            return {board: count for board, count in zip(categories, counts.tolist()) if count}
+        return board_ids.value_counts().to_dict()
+    
+    @staticmethod
+    def _merge_top(current: Optional['pd.DataFrame'], chunk: 'pd.DataFrame', column: str, k: int) -> 'pd.DataFrame':
+        """将当前块中column最大的k行与已有结果合并，只保留全局前k行"""
+        import pandas as pd
+        
+        chunk_top = chunk.nlargest(k, column)
+        if current is None:
+            return chunk_top
+        return pd.concat([current, chunk_top]).nlargest(k, column)
+    
+    def _get_ai_insights_batch(self, df_chunk: 'pd.DataFrame') -> Optional[str]:
+        """使用Gemini API分析一批帖子，返回AI输出的TSV文本"""
         if not self.client:
             return None
             
         try:
-            analysis_prompt = """
-            **AI提示词：钱币市场信息提取与分类（收购与出售 - TSV输出）**
-
-            **你的角色：** 你是一个钱币市场信息分析助手。
-
-            **你的任务：**
-            请仔细阅读并分析下面提供的每一个帖子标题及其附带的元数据（board_id,board_name, title）。你需要：
-            1.  判断该帖子的主要意图是 **"收购"（想买）** 还是 **"出售"（想卖）**，或者意图不明确归为 **"其他"**。
-            2.  从标题中提取相关的 **"物品名称"**。
-            3.  提取任何与价格相关的信息，记录在 **"价格描述"** 中（例如："428元一捆"，"每张188元"，"1060出"，"金价售"，"高价求购"，"面议"等）。
-            4.  如果"价格描述"中包含明确的阿拉伯数字，请将其提取到 **"数值价格"** 字段；若无明确数字，则此字段为空。
-            5.  根据意图和价格信息，判断 **"价格类型"**（"收购价"、"出售价"或"N/A"）。
-            6.  提取任何与数量相关的信息，记录在 **"数量描述"** 中（例如："一捆"，"5桶"，"整包"，"5-10枚"）。
-            7.  提取描述物品 **"特征/品相"** 的信息（例如："无油"，"小号"，"靓号"，"原桶"，"评级货"，"无47"，"NGC首日70分"）。
-            8.  将提取的信息与给定的 `board_id` 和 `board_name`和 `title` 一同输出。
-
-            **处理规则与注意事项：**
-
-            * **意图分类：**
-                * 包含"收购"、"求购"、"求"、"收"、"寻"等通常表示想买。
-                * 包含"出"、"售"、"转让"、"批"等通常表示想卖。
-                * 若意图不明确，或同时包含买卖信息难以区分，则归为"其他"。
-            * **物品名称：** 提取核心的、可识别的物品名称。
-            * **价格信息：**
-                * "价格描述"要尽可能完整记录原文中关于价格的说法。
-                * "数值价格"只填写纯数字，方便后续计算。如果价格是一个范围（如"5-10元"），可记录范围或平均值（并注明），或暂时只记录范围的第一个数字。
-                * 如果"价格描述"中没有具体数字（如"高价"、"面议"），则"数值价格"字段留空。
-            * **特征/品相：** 记录所有能描述物品状态、版本、评级等关键信息。
-            * **完整性：** 尽量为每一个被识别为"收购"或"出售"的帖子都提取信息，即使某些字段（如价格、数量）可能为空。
-
-            **输出格式要求（TSV - Tab-Separated Values）：**
-            请直接生成TSV格式的内容。
-            * **第一行**应为表头（列名）。
-            * 之后的**每一行**代表一条记录。
-            * **字段（列）之间用一个制表符（Tab character）分隔。**
-
-            **TSV输出示例：**
-
-            ```tsv
-            原始标题文本	意图分类	物品名称	价格描述	数值价格	价格类型	数量描述	特征/品相	板块ID	板块名称	日期
-            (示例) 原捆无油一分428元一捆，小号一分698一捆	出售	一分(纸币)	428元一捆, 698一捆	428, 698	出售价	一捆	原捆无油, 小号	11	钱币大卖场	2025-05-09 14:20:00
-            (示例) 长期收购：三版伍角纺织工人包捆	收购	三版伍角纺织工人		N/A	包捆		11	钱币大卖场	2025-05-09 14:19:43
-            (示例) 1060出龙银币---5桶-原桶	出售	龙银币	1060出	1060	出售价	5桶	原桶	9	2025-05-09 14:18:05
-            (示例) 980求龙原桶1000枚	收购	龙(币)	980求	980	收购价	1000枚, 原桶		9	2025-05-09 14:15:06
-            ... (根据你提供的数据填写，每一列用制表符分隔)
-            """
+            columns = [col for col in AI_INPUT_COLUMNS if col in df_chunk.columns]
+            payload = df_chunk[columns]
+            if 'title' in payload.columns:
+                payload = payload.assign(title=payload['title'].str.slice(0, AI_TITLE_MAX_CHARS))
+            # 批次内行号作为每行的稳定键，AI原样返回，不依赖模型照抄标题
+            payload = payload.assign(row_id=range(len(payload)))
+            # 直接把表头前缀和TSV写入同一个缓冲区，避免中间字符串拼接
+            buf = io.StringIO()
+            buf.write(_ANALYSIS_USER_PREFIX)
+            payload.to_csv(buf, sep='\t', index=False, lineterminator='\n')
+            user_content = buf.getvalue()
             
-            tsv_data = df.to_csv(sep='\t', index=False)
-            prompt_with_data = analysis_prompt + "\n以下是需要分析的帖子数据（TSV格式）：\n" + tsv_data
-            response = self.client.chat.completions.create(
-                model="gemini-2.5-flash-preview-04-17",
-                messages=[
-                    {"role": "system", "content": "你是数据分析助手，负责分析爬虫数据并提供简洁的洞察。"},
-                    {"role": "user", "content": prompt_with_data}
-                ]
-            )
-            ai_analysis = response.choices[0].message.content
+            # 相同内容的批次直接使用缓存结果
+            cache_key = _response_cache_key(user_content)
+            cached = _load_cached_response(cache_key)
+            if cached is not None:
+                return cached
+            
+            # 每批只有user消息随数据变化
+            ai_analysis, finish_reason = self._create_completion([
+                {"role": "system", "content": _ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": user_content}
+            ])
+            # 只缓存完整且含有数据行的结果；拒答、无TSV或被长度截断的回复下次重新请求
+            if finish_reason == 'length':
+                print("AI输出因长度限制被截断，结果不写入缓存")
+            elif _is_complete_tsv(ai_analysis):
+                _store_cached_response(cache_key, ai_analysis)
             return ai_analysis
             
         except Exception as e:
             print(f"AI分析过程中出错: {e}")
             return f"AI分析失败: {str(e)}"
+    
+    def _call_one(self, df_chunk: 'pd.DataFrame') -> Optional['pd.DataFrame']:
+        """分析一批帖子并解析为DataFrame，供线程池并发调用"""
+        if not _has_informative_titles(df_chunk):
+            return None
+        return parse_ai_tsv(self._get_ai_insights_batch(df_chunk))
+    
+    def _wait_for_rate_limit(self):
+        """按GEMINI_RPM为每个请求分配发出时间，必要时等待"""
+        interval = 60.0 / GEMINI_RPM if GEMINI_RPM > 0 else 0.0
+        with self._rate_lock:
+            now = time.monotonic()
+            wait_time = max(0.0, self._next_request_time - now)
+            self._next_request_time = max(now, self._next_request_time) + interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+    
+    def _create_completion(self, messages: List[Dict[str, str]]) -> Tuple[str, Optional[str]]:
+        """
+        在并发和速率限制下以流式方式调用Gemini API，返回(完整的回复文本, 结束原因)；
+        遇到限流、5xx或网络错误时带抖动地指数退避重试
+        """
+        from openai import APIConnectionError
+        
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self._wait_for_rate_limit()
+            try:
+                with self._semaphore:
+                    stream = self.client.chat.completions.create(
+                        model=GEMINI_MODEL,
+                        messages=messages,
+                        stream=True,
+                        timeout=AI_REQUEST_TIMEOUT
+                    )
+                    # 边接收边拼接，传输中断同样按网络错误重试
+                    parts = []
+                    finish_reason = None
+                    for event in stream:
+                        if event.choices:
+                            choice = event.choices[0]
+                            parts.append(choice.delta.content or "")
+                            finish_reason = getattr(choice, 'finish_reason', None) or finish_reason
+                    return "".join(parts), finish_reason
+            except Exception as e:
+                status_code = getattr(e, 'status_code', None)
+                retryable = status_code in RETRYABLE_STATUS_CODES or isinstance(e, APIConnectionError)
+                if not retryable or attempt == RATE_LIMIT_RETRIES:
+                    raise
+                wait_time = self._retry_wait_time(e, attempt)
+                reason = f"HTTP {status_code}" if status_code else type(e).__name__
+                print(f"API调用失败({reason})，等待 {wait_time:.1f} 秒后重试 ({attempt+1}/{RATE_LIMIT_RETRIES})...")
+                time.sleep(wait_time)
+    
+    @staticmethod
+    def _retry_wait_time(error: Exception, attempt: int) -> float:
+        """计算重试等待时间：优先使用服务端返回的Retry-After，否则指数退避并加入随机抖动"""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), RETRY_MAX_WAIT)
+            except ValueError:
+                pass
+        return min(2 ** attempt, RETRY_MAX_WAIT) + random.uniform(0, 1)
+
 
+# 通知内容的固定部分，发送时只填入变量
+_HEADER_TMPL = string.Template("### PM001网站数据更新通知\n\n**数据概览**:\n- 总帖子数: $total\n- 日期范围: $d0 至 $d1\n")
+_REPO_FILE_URL_TMPL = string.Template("https://github.com/$repo/blob/main/pm001_recent_posts.tsv")
+_REPO_LINK_TMPL = string.Template("\n**查看完整数据**: [GitHub仓库]($url)\n")
 
 class NotificationSender:
     """负责将分析结果发送到各种通知渠道"""
     
     def __init__(self):
         """初始化通知发送器"""
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
         self.dingtalk_webhook = os.environ.get('DINGTALK_WEBHOOK_URL')
         self.feishu_webhook = os.environ.get('FEISHU_WEBHOOK_URL')
         self.wechat_webhook = os.environ.get('WECHAT_WORK_WEBHOOK_URL')
         self.github_repo = os.environ.get('GITHUB_REPOSITORY', '')
+        self.repo_file_url = _REPO_FILE_URL_TMPL.substitute(repo=self.github_repo) if self.github_repo else ''
+        self._repo_link = _REPO_LINK_TMPL.substitute(url=self.repo_file_url) if self.github_repo else ''
+        # 通知日期在一次运行中只计算一次
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        # 复用同一个会话，多次发送时保持连接
+        self.session = requests.Session()
+        # 连接失败时自动重试；POST默认不会在服务端已收到请求后重试，避免重复通知
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=3, backoff_factor=0.3)
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # 预先构建各渠道的消息模板，发送时只需填入内容
+        self._dingtalk_template = {
+            "msgtype": "markdown",
+            "markdown": {
+                "title": f"PM001爬虫数据更新 ({self.today})",
+                "text": ""
+            }
+        }
+        # 飞书的消息格式与钉钉不同
+        self._feishu_template = {
+            "msg_type": "interactive",
+            "card": {
+                "header": {
+                    "title": {
+                        "tag": "plain_text",
+                        "content": f"PM001爬虫数据更新 ({self.today})"
+                    },
+                    "template": "blue"
+                },
+                "elements": [
+                    {
+                        "tag": "div",
+                        "text": {
+                            "tag": "lark_md",
+                            "content": ""
+                        }
+                    }
+                ]
+            }
+        }
+        # 如果有GitHub仓库链接，添加按钮
+        if self.github_repo:
+            self._feishu_template["card"]["elements"].append({
+                "tag": "action",
+                "actions": [
+                    {
+                        "tag": "button",
+                        "text": {
+                            "tag": "plain_text",
+                            "content": "查看完整数据"
+                        },
+                        "url": self.repo_file_url,
+                        "type": "default"
+                    }
+                ]
+            })
+        self._wechat_template = {
+            "msgtype": "markdown",
+            "markdown": {
+                "content": ""
+            }
+        }
     
     def prepare_notification(self, summary: Dict[str, Any], ai_analysis: Optional[str]) -> str:
         """准备通知内容"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        # 构建通知内容
-        content = f"""### PM001网站数据更新通知
-
-**数据概览**:
-- 总帖子数: {summary.get('total_posts', 0)}
-- 日期范围: {summary.get('date_range', ['未知', '未知'])[0]} 至 {summary.get('date_range', ['未知', '未知'])[1]}
-"""
+        # 构建通知内容，各部分依次写入缓冲区
+        date_range = summary.get('date_range', ['未知', '未知'])
+        buf = io.StringIO()
+        buf.write(_HEADER_TMPL.substitute(
+            total=summary.get('total_posts', 0),
+            d0=date_range[0],
+            d1=date_range[1]
+        ))
 
         # 添加AI分析结果（如果有）
         if ai_analysis:
-            content += f"""
-**AI分析摘要**:
-{ai_analysis}
-"""
+            buf.write("\n**AI分析摘要**:\n")
+            buf.write(ai_analysis)
+            buf.write("\n")
         else:
             # 如果没有AI分析，添加一些基本统计信息
             board_dist = summary.get('board_distribution', {})
-            if board_dist:
-                content += "\n**板块分布**:\n"
-                for board, count in sorted(board_dist.items(), key=lambda x: x[1], reverse=True)[:5]:
-                    content += f"- 板块 {board}: {count} 篇帖子\n"
+            if len(board_dist):
+                buf.write("\n**板块分布**:\n")
+                # pandas路径得到已降序排列的Series，标准库路径得到dict
+                if isinstance(board_dist, dict):
+                    top_boards = heapq.nlargest(5, board_dist.items(), key=operator.itemgetter(1))
+                else:
+                    top_boards = board_dist.head(5).items()
+                for board, count in top_boards:
+                    buf.write(f"- 板块 {board}: {count} 篇帖子\n")
             
-            recent = summary.get('recent_posts', [])
+            recent = summary.get('recent_posts', '')
             if recent:
-                content += "\n**最新帖子**:\n"
-                for post in recent[:3]:
+                buf.write("\n**最新帖子**:\n")
+                # recent_posts为带表头的TSV文本
+                for post in itertools.islice(csv.DictReader(io.StringIO(recent), delimiter='\t'), 3):
                     title = post.get('title', '无标题')
                     author = post.get('author', '未知')
                     date = post.get('date', '未知日期')
-                    content += f"- {title} (作者: {author}, 日期: {date})\n"
+                    buf.write(f"- {title} (作者: {author}, 日期: {date})\n")
         
         # 添加数据链接
-        if self.github_repo:
-            content += f"""
-**查看完整数据**: [GitHub仓库](https://github.com/{self.github_repo}/blob/main/pm001_recent_posts.tsv)
-"""
+        buf.write(self._repo_link)
         
-        return content
+        return buf.getvalue()
     
     def send_to_dingtalk(self, content: str) -> bool:
         """发送通知到钉钉"""
@@ -272,19 +814,14 @@ class NotificationSender:
             return False
             
         try:
-            today = datetime.now().strftime('%Y-%m-%d')
-            message = {
-                "msgtype": "markdown",
-                "markdown": {
-                    "title": f"PM001爬虫数据更新 ({today})",
-                    "text": content
-                }
-            }
+            message = copy.deepcopy(self._dingtalk_template)
+            message["markdown"]["text"] = content
             
-            response = requests.post(
+            response = self.session.post(
                 self.dingtalk_webhook,
                 headers={"Content-Type": "application/json"},
-                data=json.dumps(message)
+                data=_dumps_json(message),
+                timeout=WEBHOOK_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -305,51 +842,14 @@ class NotificationSender:
             return False
             
         try:
-            # 飞书的消息格式与钉钉不同
-            today = datetime.now().strftime('%Y-%m-%d')
-            message = {
-                "msg_type": "interactive",
-                "card": {
-                    "header": {
-                        "title": {
-                            "tag": "plain_text",
-                            "content": f"PM001爬虫数据更新 ({today})"
-                        },
-                        "template": "blue"
-                    },
-                    "elements": [
-                        {
-                            "tag": "div",
-                            "text": {
-                                "tag": "lark_md",
-                                "content": content
-                            }
-                        }
-                    ]
-                }
-            }
+            message = copy.deepcopy(self._feishu_template)
+            message["card"]["elements"][0]["text"]["content"] = content
             
-            # 如果有GitHub仓库链接，添加按钮
-            if self.github_repo:
-                message["card"]["elements"].append({
-                    "tag": "action",
-                    "actions": [
-                        {
-                            "tag": "button",
-                            "text": {
-                                "tag": "plain_text",
-                                "content": "查看完整数据"
-                            },
-                            "url": f"https://github.com/{self.github_repo}/blob/main/pm001_recent_posts.tsv",
-                            "type": "default"
-                        }
-                    ]
-                })
-            
-            response = requests.post(
+            response = self.session.post(
                 self.feishu_webhook,
                 headers={"Content-Type": "application/json"},
-                data=json.dumps(message)
+                data=_dumps_json(message),
+                timeout=WEBHOOK_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -370,17 +870,14 @@ class NotificationSender:
             return False
             
         try:
-            message = {
-                "msgtype": "markdown",
-                "markdown": {
-                    "content": content
-                }
-            }
+            message = copy.deepcopy(self._wechat_template)
+            message["markdown"]["content"] = content
             
-            response = requests.post(
+            response = self.session.post(
                 self.wechat_webhook,
                 headers={"Content-Type": "application/json"},
-                data=json.dumps(message)
+                data=_dumps_json(message),
+                timeout=WEBHOOK_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -396,147 +893,303 @@ class NotificationSender:
     
     def send_notification(self, content: str) -> bool:
         """尝试发送到所有配置的通知渠道"""
-        success = False
-        
-        # 尝试发送到钉钉
+        # 收集已配置的通知渠道
+        senders = []
         if self.dingtalk_webhook:
-            dingtalk_success = self.send_to_dingtalk(content)
-            success = success or dingtalk_success
-        
-        # 尝试发送到飞书
+            senders.append(self.send_to_dingtalk)
         if self.feishu_webhook:
-            feishu_success = self.send_to_feishu(content)
-            success = success or feishu_success
-        
-        # 尝试发送到企业微信
+            senders.append(self.send_to_feishu)
         if self.wechat_webhook:
-            wechat_success = self.send_to_wechat_work(content)
-            success = success or wechat_success
+            senders.append(self.send_to_wechat_work)
         
         # 如果没有配置任何通知渠道
-        if not (self.dingtalk_webhook or self.feishu_webhook or self.wechat_webhook):
+        if not senders:
             print("警告: 未配置任何通知渠道")
             # 将内容打印到控制台
             print("\n=== 通知内容 ===\n")
             print(content)
             print("\n=================\n")
+            return False
         
-        return success
+        # 各渠道相互独立，并发发送
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(senders)) as executor:
+            results = list(executor.map(lambda send: send(content), senders))
+        
+        return any(results)
+
+
+def _dumps_json(message: Dict[str, Any]) -> bytes:
+    """将webhook消息序列化为UTF-8编码的JSON"""
+    if HAS_ORJSON:
+        return orjson.dumps(message)
+    return json.dumps(message, ensure_ascii=False).encode('utf-8')
+
 
+# AI输出中的```tsv代码块
+_TSV_BLOCK_RE = re.compile(r"```tsv\s*([\s\S]+?)```")
+# parse_ai_tsv使用的宽松匹配，允许缺少语言标记或结尾标记
+_TSV_FENCE_RE = re.compile(r"```(?:tsv)?[ \t]*\n([\s\S]*?)(?:```|$)")
+# TSV块中需要丢弃的行
+_SKIP_PREFIXES = ("AI分析失败", "# ")
 
 def extract_tsv_from_ai_output(ai_output: str) -> list:
     """
     从AI输出中提取TSV表头及数据行，过滤说明性文字和错误提示。
     返回TSV行列表（含表头）。
     """
-    # 匹配 ```tsv ... ``` 或直接以表头开头的TSV块
-    tsv_block = ""
-    # 优先找```tsv代码块
-    match = re.search(r"```tsv\s*([\s\S]+?)```", ai_output)
-    if match:
-        tsv_block = match.group(1)
-    else:
-        # 退而求其次，找以"原始标题文本"开头的行及其下方内容
-        lines = ai_output.splitlines()
-        for idx, line in enumerate(lines):
-            if line.strip().startswith("原始标题文本"):
-                tsv_block = "\n".join(lines[idx:])
-                break
-    # 分割为行，去除空行和错误提示
-    tsv_lines = [l for l in tsv_block.splitlines() if l.strip() and not l.startswith("AI分析失败") and not l.startswith("# ")]
+    # 优先取```tsv代码块；没有代码块时从以"原始标题文本"开头的行开始取
+    match = _TSV_BLOCK_RE.search(ai_output)
+    started = match is not None
+    tsv_lines = []
+    for line in (match.group(1) if match else ai_output).splitlines():
+        stripped = line.strip()
+        if not started and stripped.startswith("原始标题文本"):
+            started = True
+        # 去除空行和错误提示
+        if started and stripped and not line.startswith(_SKIP_PREFIXES):
+            tsv_lines.append(line)
     return tsv_lines
 
+def _is_complete_tsv(ai_output: Optional[str]) -> bool:
+    """AI输出中是否有以"原始标题文本"开头的表头和至少一行数据"""
+    if not ai_output:
+        return False
+    tsv_lines = extract_tsv_from_ai_output(ai_output)
+    return len(tsv_lines) >= 2 and tsv_lines[0].strip().startswith("原始标题文本")
+
+def _read_ai_tsv(text: str, dtype: Any = str) -> Tuple['pd.DataFrame', int]:
+    """
+    按TSV读取AI输出，模型输出不做引号转义，按原样读取。
+    字段多于表头的行截去多余字段，字段不足的行补空字符串，都不丢弃。
+    
+    返回:
+        (DataFrame, 被截断的行数)
+    """
+    import pandas as pd
+    
+    num_fields = len(text.split('\n', 1)[0].split('\t'))
+    trimmed = 0
+    
+    def trim_fields(fields: List[str]) -> List[str]:
+        nonlocal trimmed
+        trimmed += 1
+        return fields[:num_fields]
+    
+    # on_bad_lines传入函数时只能使用python解析器
+    df = pd.read_csv(
+        io.StringIO(text),
+        sep='\t',
+        dtype=dtype,
+        keep_default_na=False,
+        quoting=csv.QUOTE_NONE,
+        engine='python',
+        on_bad_lines=trim_fields
+    )
+    return df.fillna(''), trimmed
+
+def parse_ai_tsv(ai_output: Optional[str]) -> Optional['pd.DataFrame']:
+    """
+    将单个批次的AI输出解析为DataFrame，输出无效或无法解析时返回None。
+    """
+    if not ai_output or ai_output.strip().startswith("AI分析失败"):
+        return None
+    # 去掉```tsv代码块标记，并跳过表头之前的说明文字
+    match = _TSV_FENCE_RE.search(ai_output)
+    cleaned = match.group(1) if match else ai_output
+    header_pos = cleaned.find("原始标题文本")
+    if header_pos > 0:
+        cleaned = cleaned[header_pos:]
+    
+    try:
+        df, _ = _read_ai_tsv(cleaned, dtype='string')
+    except Exception as e:
+        print(f"解析AI输出TSV时出错: {e}")
+        return None
+    return df if not df.empty else None
+
+def insert_board_names(df: 'pd.DataFrame') -> 'pd.DataFrame':
+    """
+    根据板块ID整列填充中文板块名称：AI不输出该列，在板块ID后新增；已有"板块名称"列则直接覆盖。
+    """
+    if '板块ID' not in df.columns:
+        return df
+    board_ids = df['板块ID'].astype(str)
+    board_names = board_ids.map(BOARD_ID_NAME_MAP).fillna(board_ids)
+    if '板块名称' in df.columns:
+        df['板块名称'] = board_names
+    else:
+        df.insert(df.columns.get_loc('板块ID') + 1, '板块名称', board_names)
+    return df
+
 def merge_all_ai_tsv_results(ai_outputs: list) -> str:
     """
     合并所有AI输出的TSV内容，只保留第一个表头，去重数据行，并将board_id映射为中文名称，新增"板块名称"列。
     """
     all_lines = []
-    header = None
+    seen = set()
     for ai_output in ai_outputs:
         tsv_lines = extract_tsv_from_ai_output(ai_output)
         if not tsv_lines:
             continue
-        if header is None:
-            header = tsv_lines[0]
-            all_lines.append(header)
-            all_lines.extend(tsv_lines[1:])
-        else:
-            all_lines.extend(tsv_lines[1:])
-    # 去重
-    all_lines = [all_lines[0]] + list(dict.fromkeys(all_lines[1:]))
-    # 替换board_id为中文名称，新增"板块名称"列
-    if all_lines:
-        header_fields = all_lines[0].split('\t')
-        if '板块ID' in header_fields:
-            idx = header_fields.index('板块ID')
-            if '板块名称' not in header_fields:
-                header_fields.insert(idx+1, '板块名称')
-            new_lines = ['\t'.join(header_fields)]
-            for line in all_lines[1:]:
-                fields = line.split('\t')
-                if len(fields) > idx:
-                    board_id = fields[idx].strip()
-                    board_name = BOARD_ID_NAME_MAP.get(board_id, board_id)
-                    fields.insert(idx+1, board_name)
-                new_lines.append('\t'.join(fields))
-            return '\n'.join(new_lines)
-    return '\n'.join(all_lines)
-
-
-def split_and_analyze_by_board(data_file: str, analyzer: 'AIAnalyzer', batch_size: int = 100, max_retry: int = 3, max_workers: int = 5) -> str:
+        if not all_lines:
+            all_lines.append(tsv_lines[0])
+        # 边合并边去重，重复行不进入结果列表
+        for line in tsv_lines[1:]:
+            if line in seen:
+                continue
+            seen.add(line)
+            all_lines.append(line)
+    if not all_lines or '板块ID' not in all_lines[0].split('\t'):
+        return '\n'.join(all_lines)
+    
+    df, trimmed = _read_ai_tsv('\n'.join(all_lines))
+    if trimmed:
+        print(f"合并AI结果时有 {trimmed} 行字段多于表头，已截去多余字段")
+    # 行号只在批次内有意义，不写入最终结果
+    df = df.drop(columns=[ROW_KEY_COLUMN], errors='ignore')
+    return insert_board_names(df).to_csv(sep='\t', index=False, quoting=csv.QUOTE_NONE, lineterminator='\n')
+
+
+def expand_duplicate_titles(ai_output: str, extra_dates: Dict[int, List[str]]) -> str:
     """
-    按board_id分组并分批调用AI分析，合并所有结果为一个TSV字符串，支持每个板块内批次并发。
+    为去重时省略的同标题帖子复制AI结果行，只替换日期，返回展开后的TSV文本。
+    extra_dates为"批次内行号 -> 被省略帖子的日期列表"，按AI输出的行号列匹配；
+    AI输出中找不到的行号会打印出来，并统计因此丢失的帖子数。
     """
-    if not os.path.exists(data_file):
-        print(f"错误: 文件 {data_file} 不存在")
-        return "数据文件不存在"
+    if not extra_dates:
+        return ai_output
+    tsv_lines = extract_tsv_from_ai_output(ai_output)
+    if len(tsv_lines) < 2:
+        return ai_output
+    header_fields = tsv_lines[0].split('\t')
+    if ROW_KEY_COLUMN not in header_fields or '日期' not in header_fields:
+        lost = sum(len(dates) for dates in extra_dates.values())
+        print(f"  [WARN] AI输出缺少{ROW_KEY_COLUMN}或日期列，无法展开重复标题，丢失 {lost} 条帖子")
+        return ai_output
+    key_idx = header_fields.index(ROW_KEY_COLUMN)
+    date_idx = header_fields.index('日期')
+    
+    expanded = [tsv_lines[0]]
+    expanded_keys = set()
+    for line in tsv_lines[1:]:
+        expanded.append(line)
+        fields = line.split('\t')
+        if len(fields) <= max(key_idx, date_idx):
+            continue
+        try:
+            key = int(fields[key_idx].strip())
+        except ValueError:
+            continue
+        # AI对同一行号输出多行时只展开一次
+        if key in expanded_keys or key not in extra_dates:
+            continue
+        expanded_keys.add(key)
+        for date in extra_dates[key]:
+            fields[date_idx] = date
+            expanded.append('\t'.join(fields))
+    
+    missing = sorted(set(extra_dates) - expanded_keys)
+    if missing:
+        lost = sum(len(extra_dates[key]) for key in missing)
+        print(f"  [WARN] AI输出中找不到行号 {missing}，丢失 {lost} 条同标题帖子")
+    return '\n'.join(expanded)
+
+
+def _dedup_titles(group: 'pd.DataFrame') -> Tuple['pd.DataFrame', Dict[int, List[str]]]:
+    """
+    去掉板块内标题重复的帖子（按发送给AI的截断标题比较），
+    返回去重后的数据及"保留行在去重后数据中的位置 -> 被省略帖子的日期列表"映射。
+    """
+    import pandas as pd
+    
+    ai_titles = group['title'].str.slice(0, AI_TITLE_MAX_CHARS)
+    duplicated = (ai_titles.duplicated() & ai_titles.notna()).to_numpy()
+    if not duplicated.any():
+        return group, {}
+    
+    # 每个标题第一次出现的行即为保留行
+    kept_pos = {title: pos for pos, title in enumerate(ai_titles[~duplicated]) if not pd.isna(title)}
+    dates = group['date'][duplicated]
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        dates = dates.dt.strftime(POST_DATE_FORMAT)
+    extra_dates: Dict[int, List[str]] = {}
+    for title, date in zip(ai_titles[duplicated], dates.astype(object).fillna('')):
+        extra_dates.setdefault(kept_pos[title], []).append(str(date))
+    return group[~duplicated].reset_index(drop=True), extra_dates
+
 
+def _read_posts_for_analysis(data_file: str) -> Tuple[Optional['pd.DataFrame'], Optional[str]]:
+    """读取帖子数据，返回(DataFrame, 错误信息)，读取失败时DataFrame为None"""
     try:
-        df = pd.read_csv(data_file, sep='\t')
-        print(f"成功读取数据文件，包含 {len(df)} 条记录")
+        df = _read_tsv(data_file)
+        print(f"成功读取数据文件，包含 {len(df)} 条记录，占用内存 {df.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB")
+        return df, None
+    except FileNotFoundError:
+        print(f"错误: 文件 {data_file} 不存在")
+        return None, "数据文件不存在"
     except Exception as e:
         print(f"读取文件时出错: {e}")
-        return f"读取文件时出错: {e}"
+        return None, f"读取文件时出错: {e}"
+
+
+def split_and_analyze_by_board(data_file: str, analyzer: 'AIAnalyzer', batch_size: int = BATCH_ROWS, max_workers: int = AI_MAX_WORKERS) -> str:
+    """
+    读取数据文件并按板块分批进行AI分析，见split_and_analyze_by_board_df。
+    """
+    df, error = _read_posts_for_analysis(data_file)
+    if df is None:
+        return error
+    return split_and_analyze_by_board_df(df, analyzer, batch_size=batch_size, max_workers=max_workers)
 
+
+def split_and_analyze_by_board_df(df: 'pd.DataFrame', analyzer: 'AIAnalyzer', batch_size: int = BATCH_ROWS, max_workers: int = AI_MAX_WORKERS) -> str:
+    """
+    按board_id分组并分批调用AI分析，合并所有结果为一个TSV字符串，所有板块的批次共用一个线程池并发执行。
+    """
     ai_outputs = []
 
-    def analyze_batch(board_id, batch_idx, num_batches, batch_df):
+    def analyze_batch(board_id, batch_idx, num_batches, batch_df, extra_dates):
+        # 标题全为空的批次无需调用AI；内容相同的批次由响应缓存直接返回
+        if not _has_informative_titles(batch_df):
+            print(f"  [SKIP] 板块{board_id} 第{batch_idx+1}/{num_batches}批没有有效标题，跳过")
+            return None
         print(f"  [INFO] 开始AI分析：板块{board_id} 第{batch_idx+1}/{num_batches}批，数据量：{len(batch_df)} 条")
-        ai_result = None
-        for attempt in range(1, max_retry+1):
-            try:
-                ai_result = analyzer._get_ai_insights(batch_df)
-                if ai_result and not ai_result.strip().startswith("AI分析失败"):
-                    print(f"  [SUCCESS] AI分析完成：板块{board_id} 第{batch_idx+1}/{num_batches}批，返回{len(ai_result)}字符 (第{attempt}次尝试)")
-                    print(f"  [AI OUTPUT] 前200字符：\n{ai_result[:200]}\n...")
-                    return ai_result
-                else:
-                    print(f"  [FAIL] AI分析失败或返回无效内容：板块{board_id} 第{batch_idx+1}/{num_batches}批 (第{attempt}次尝试)")
-            except Exception as e:
-                print(f"  [ERROR] AI分析异常：板块{board_id} 第{batch_idx+1}/{num_batches}批，异常：{e} (第{attempt}次尝试)")
-        print(f"  [ERROR] AI分析最终失败：板块{board_id} 第{batch_idx+1}/{num_batches}批，已重试{max_retry}次，跳过该批次")
-        return None
+        # 限流和临时错误已在API调用处退避重试，这里只调用一次
+        ai_result = analyzer._get_ai_insights_batch(batch_df)
+        if not ai_result or ai_result.strip().startswith("AI分析失败"):
+            print(f"  [ERROR] AI分析失败或返回无效内容：板块{board_id} 第{batch_idx+1}/{num_batches}批，跳过该批次")
+            return None
+        print(f"  [SUCCESS] AI分析完成：板块{board_id} 第{batch_idx+1}/{num_batches}批，返回{len(ai_result)}字符")
+        print(f"  [AI OUTPUT] 前200字符：\n{ai_result[:200]}\n...")
+        return expand_duplicate_titles(ai_result, extra_dates)
 
-    for board_id, group in df.groupby('board_id'):
+    # 先收集所有板块的批次，再统一提交到同一个线程池
+    batch_args = []
+    for board_id, group in df.groupby('board_id', observed=True):
         group = group.reset_index(drop=True)
         total = len(group)
-        num_batches = math.ceil(total / batch_size)
-        print(f"分析板块 {board_id}，共{total}条，分为{num_batches}批")
-        batch_args = [(board_id, i, num_batches, group.iloc[i*batch_size : (i+1)*batch_size]) for i in range(num_batches)]
-        # 并发处理每个板块的批次
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_idx = {executor.submit(analyze_batch, *args): idx for idx, args in enumerate(batch_args)}
-            # 保证顺序合并
-            batch_results = [None] * num_batches
-            for future in concurrent.futures.as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                try:
-                    result = future.result()
-                    batch_results[idx] = result
-                except Exception as exc:
-                    print(f"  [ERROR] 并发AI分析批次异常: {exc}")
-            # 只收集成功的结果
-            ai_outputs.extend([r for r in batch_results if r and not r.strip().startswith("AI分析失败")])
+        # 标题相同的帖子只发送一次，AI结果返回后再按各自日期展开
+        group, extra_dates = _dedup_titles(group)
+        num_batches = math.ceil(len(group) / batch_size)
+        print(f"分析板块 {board_id}，共{total}条（去重后{len(group)}条），分为{num_batches}批")
+        for i in range(num_batches):
+            start = i * batch_size
+            # 行号换算为批次内的位置，与发送给AI的row_id一致
+            batch_extra = {pos - start: dates for pos, dates in extra_dates.items() if start <= pos < start + batch_size}
+            batch_args.append((board_id, i, num_batches, group.iloc[start:start + batch_size], batch_extra))
+
+    # 并发处理所有批次，结果按(板块, 批次)顺序合并
+    batch_results = [None] * len(batch_args)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_idx = {executor.submit(analyze_batch, *args): idx for idx, args in enumerate(batch_args)}
+        for future in concurrent.futures.as_completed(future_to_idx):
+            idx = future_to_idx[future]
+            try:
+                batch_results[idx] = future.result()
+            except Exception as exc:
+                print(f"  [ERROR] 并发AI分析批次异常: {exc}")
+    # 只收集成功的结果
+    ai_outputs.extend([r for r in batch_results if r and not r.strip().startswith("AI分析失败")])
 
     print(f"[INFO] 全部AI分析批次完成，开始合并TSV结果")
     final_tsv = merge_all_ai_tsv_results(ai_outputs)
@@ -552,24 +1205,43 @@ def analyze_and_notify(data_file: str) -> bool:
 
     # 1. 初始化AI分析器
     analyzer = AIAnalyzer()
+    
+    # 未配置AI时按关键词离线分类，逐块写入keyword_analysis.tsv
+    if not analyzer.client:
+        try:
+            total = write_keyword_analysis(data_file, 'keyword_analysis.tsv')
+        except FileNotFoundError:
+            print(f"错误: 文件 {data_file} 不存在")
+            return False
+        except Exception as e:
+            print(f"关键词分类时出错: {e}")
+            return False
+        print(f"未配置AI，已按关键词分类 {total} 条帖子，结果已保存到 keyword_analysis.tsv")
+        return True
 
-    # 2. 分批AI分析
-    ai_analysis = split_and_analyze_by_board(data_file, analyzer, batch_size=100)
-    if not ai_analysis or ai_analysis.startswith("数据文件不存在") or ai_analysis.startswith("读取文件时出错"):
+    # 2. 只读取一次数据，摘要统计和分批AI分析共用同一个DataFrame
+    df, error = _read_posts_for_analysis(data_file)
+    if df is None:
+        print("AI分析失败，退出")
+        return False
+    summary = analyzer._generate_data_summary(df)
+    print(f"数据概览: 共 {summary.get('total_posts', 0)} 条帖子，日期范围 {' 至 '.join(summary.get('date_range', ['未知', '未知']))}")
+    
+    ai_analysis = split_and_analyze_by_board_df(df, analyzer, batch_size=BATCH_ROWS)
+    if not ai_analysis:
         print("AI分析失败，退出")
         return False
 
     # 3. 保存分析结果
     try:
-        with open('analysis_result.tsv', 'w', encoding='utf-8') as f:
-            f.write(ai_analysis)
+        Path('analysis_result.tsv').write_text(ai_analysis, encoding='utf-8')
         print("分析结果已保存到 analysis_result.tsv")
     except Exception as e:
         print(f"保存分析结果时出错: {e}")
 
     # 4. 可选：发送通知（如需，可拼接简要统计信息）
     # sender = NotificationSender()
-    # notification_content = sender.prepare_notification({}, ai_analysis)
+    # notification_content = sender.prepare_notification(summary, ai_analysis)
     # sender.send_notification(notification_content)
 
     return True
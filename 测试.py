@@ -3,13 +3,47 @@ import requests
 from bs4 import BeautifulSoup
 import datetime
 import re
-import csv
 import time
 import logging
 import os
 import random
+import csv
+import asyncio
+import threading
+import codecs
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from requests.packages.urllib3.util.request import ACCEPT_ENCODING as URLLIB3_ACCEPT_ENCODING
+
+# 可选：安装aiohttp时并发抓取页面，否则逐页顺序抓取
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+# aiohttp 3.9起才有compression_utils，用于判断能否解压br/zstd；没有时只声明gzip/deflate
+try:
+    from aiohttp import compression_utils as aiohttp_compression
+except ImportError:
+    aiohttp_compression = None
+
+# 可选：安装lxml时使用C实现的HTML解析器，否则使用标准库html.parser
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# 可选：安装orjson时用其读写页面缓存，否则使用标准库json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 #########################################
 # 配置部分 - 所有可定制参数集中在此处
@@ -31,6 +65,27 @@ MAX_RETRIES = 3  # 最大重试次数
 RETRY_BACKOFF_FACTOR = 0.5  # 重试退避因子
 RETRY_STATUS_CODES = [408, 429, 500, 502, 503, 504]  # 触发重试的HTTP状态码
 REQUEST_TIMEOUT = 30  # 请求超时时间（秒）
+POOL_CONNECTIONS = 4  # 连接池缓存的主机数
+POOL_MAXSIZE = max(16, len(TARGET_BOARD_IDS))  # 每个主机保持的最大连接数，不少于板块数
+CONCURRENT_REQUESTS = 4  # 异步抓取时同时进行的请求数上限
+DNS_CACHE_TTL = 600  # 异步抓取时DNS解析结果的缓存时间（秒）
+PARSE_PROCESSES = min(4, os.cpu_count() or 1)  # 异步抓取后解析页面的进程数，小于2时在当前进程中解析
+PROCESS_PARSE_MIN_PAGES = 32  # 页面数达到此值才使用进程池解析，页面少时进程启动开销大于收益
+DEFAULT_ENCODING = 'gbk'  # 页面未声明编码时使用的编码
+
+# 按压缩率从高到低声明可接受的压缩格式；br/zstd只在安装了对应解压库（brotli/zstandard）时声明
+def accept_encoding(supported):
+    return ', '.join(encoding for encoding in ('br', 'zstd', 'gzip', 'deflate') if encoding in supported)
+
+# 所有请求共用的请求头，User-Agent在每次抓取开始时随机选定
+COMMON_HEADERS = {
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': accept_encoding(URLLIB3_ACCEPT_ENCODING.split(',')),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+    'Connection': 'keep-alive',
+    'Cache-Control': 'max-age=0',
+    'Referer': BASE_URL,  # 添加引用来源，模拟真实浏览行为
+}
 
 # 延迟配置
 PAGE_DELAY_MIN = 2  # 页面间最小延迟（秒）
@@ -41,8 +96,10 @@ BOARD_DELAY_MAX = 6  # 板块间最大延迟（秒）
 # 输出配置
 OUTPUT_FILENAME = 'pm001_recent_posts.tsv'  # 输出文件名
 LOG_FILENAME = 'pm001_scraper.log'  # 日志文件名
+HTTP_CACHE_FILE = 'pm001_http_cache.json'  # 条件请求缓存文件，保存各页面的ETag/Last-Modified和解析结果
+HTTP_CACHE_MAX_AGE_DAYS = 7  # 超过该天数未抓取的页面缓存在保存时删除
 LOG_LEVEL = logging.INFO  # 日志级别
-TSV_FIELDS = ['board_id', 'page', 'post_id', 'title', 'author', 'date', 'replies', 'views']  # TSV导出字段
+TSV_FIELDS = ['board_id', 'board_name', 'page', 'post_id', 'title', 'author', 'date', 'replies', 'views']  # TSV导出字段
 
 # 随机User-Agent列表
 USER_AGENTS = [
@@ -102,24 +159,69 @@ def create_session_with_retry():
         status_forcelist=RETRY_STATUS_CODES,
         allowed_methods=["GET"]
     )
-    adapter = HTTPAdapter(max_retries=retries)
+    # 连接池按板块数设置大小，已建立的连接得以持续复用；池满时不阻塞等待，避免请求被连接池串行化
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retries, pool_block=False)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
+    session.headers.update(COMMON_HEADERS)
+    session.headers['User-Agent'] = get_random_user_agent()
     return session
 
-# Function to get soup object from a URL
-def get_soup(url, max_retries=MAX_RETRIES):
+# 模块级共享会话，所有请求复用同一个连接池
+_SESSION = create_session_with_retry()
+
+# HTTP响应头Content-Type中声明的字符集
+_CONTENT_TYPE_CHARSET_RE = re.compile(r'charset=["\']?([\w-]+)', re.IGNORECASE)
+# 页面<meta>中声明的字符集，只在页面开头查找
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+# 声明为GB2312的页面中常混有GBK字符，按其超集解码
+_CHARSET_SUPERSETS = {'gb2312': 'gbk', 'gb_2312-80': 'gbk'}
+HTML_PARSER = 'lxml' if HAS_LXML else 'html.parser'
+
+def content_type_charset(content_type):
+    """从Content-Type响应头中取出字符集，未声明时返回None"""
+    match = _CONTENT_TYPE_CHARSET_RE.search(content_type or '')
+    return match.group(1) if match else None
+
+def page_encoding(content, charset=None):
+    """
+    确定页面编码，不对整个页面做编码探测：
+    优先使用响应头声明的字符集，其次是页面<meta>中声明的字符集，都没有时使用DEFAULT_ENCODING；
+    GB2312按其超集GBK解码
+    
+    Args:
+        content: 页面的字节内容
+        charset: 响应头Content-Type中声明的字符集
+    """
+    if not charset:
+        match = _META_CHARSET_RE.search(content, 0, 4096)
+        charset = match.group(1).decode('ascii') if match else DEFAULT_ENCODING
+    encoding = charset.lower()
+    encoding = _CHARSET_SUPERSETS.get(encoding, encoding)
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        logger.debug(f"未知的字符集 '{charset}'，使用 {DEFAULT_ENCODING}")
+        return DEFAULT_ENCODING
+    return encoding
+
+def make_soup(content, charset=None):
+    """将页面的字节内容解析为BeautifulSoup对象"""
+    return BeautifulSoup(content, HTML_PARSER, from_encoding=page_encoding(content, charset))
+
+def get_page_content(url, max_retries=MAX_RETRIES, headers=None):
     """
-    获取URL内容并返回BeautifulSoup对象，带有重试和错误处理机制
+    获取URL的字节内容，带有重试和错误处理机制
     
     Args:
         url: 要抓取的网页URL
         max_retries: 最大重试次数
+        headers: 额外的请求头，如条件请求头
         
     Returns:
-        BeautifulSoup对象或None（如果请求失败）
+        (页面的字节内容, 响应头声明的字符集, 响应头)，页面未修改时返回NOT_MODIFIED，请求失败时返回None
     """
-    session = create_session_with_retry()
+    session = _SESSION
     retry_count = 0
     backoff_time = 2  # 初始等待时间，秒
 
@@ -127,37 +229,15 @@ def get_soup(url, max_retries=MAX_RETRIES):
     
     while retry_count <= max_retries:
         try:
-            headers = {
-                'User-Agent': get_random_user_agent(),
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-                'Connection': 'keep-alive',
-                'Cache-Control': 'max-age=0',
-                'Referer': BASE_URL,  # 添加引用来源，模拟真实浏览行为
-            }
-            
+            # 公共请求头和User-Agent已设置在会话上
             response = session.get(url, timeout=REQUEST_TIMEOUT, headers=headers)
             logger.debug(f"收到 URL {url} 的响应，状态码: {response.status_code}")
-            
-            # 尝试自动检测编码
-            detected_encoding = None
-            try:
-                detected_encoding = response.apparent_encoding
-                response.encoding = detected_encoding
-                logger.debug(f"自动检测到编码: {detected_encoding}")
-            except Exception as e:
-                logger.debug(f"自动检测编码失败: {str(e)}，使用默认的GBK编码")
-                # 如果自动检测失败，回退到gbk
-                response.encoding = 'gbk'
                 
             if response.status_code == 200:
-                try:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    return soup
-                except Exception as e:
-                    logger.error(f"解析 HTML 内容时出错 {url}: {str(e)}")
-                    return None
+                # 返回字节内容，由解析函数根据响应头或页面声明确定编码
+                return response.content, content_type_charset(response.headers.get('Content-Type')), response.headers
+            elif response.status_code == 304:
+                return NOT_MODIFIED
             else:
                 logger.warning(f"错误: 从 URL 获取到状态码 {response.status_code}: {url}")
                 # 对于可重试的状态码，重试
@@ -203,6 +283,33 @@ def get_soup(url, max_retries=MAX_RETRIES):
             return None
     return None
 
+# 帖子链接中的帖子ID
+_ID_RE = re.compile(r'ID=(\d+)', re.IGNORECASE)
+# 标准日期格式：年-月-日 时:分:秒（分隔符可为/或-）
+_DATE_STD_RE = re.compile(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})\s+(\d{1,2}):(\d{1,2}):(\d{1,2})')
+
+# 标准格式之外依次尝试的日期格式
+_DATE_FORMATS = [
+    '%Y-%m-%d %H:%M',       # 2023-01-02 10:30
+    '%Y-%m-%d',             # 2023-01-02
+    '%y-%m-%d %H:%M:%S',    # 23-01-02 10:30:45
+    '%y-%m-%d %H:%M',       # 23-01-02 10:30
+    '%y-%m-%d',             # 23-01-02
+    '%m-%d %H:%M:%S',       # 01-02 10:30:45 (当前年份)
+    '%m-%d %H:%M'           # 01-02 10:30 (当前年份)
+]
+
+# 以上格式都不匹配时用于提取日期的正则
+_DATE_FALLBACK_RES = [
+    # 年-月-日 时:分:秒
+    re.compile(r'(\d{2,4})[/-](\d{1,2})[/-](\d{1,2})[\s]+(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?'),
+    # 月-日 时:分:秒 (当前年份)
+    re.compile(r'(\d{1,2})[/-](\d{1,2})[\s]+(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?'),
+]
+
+# 不带年份的日期按当前年份补全；每次抓取开始时由scrape_recent_posts刷新，不在解析每个日期时调用now()
+_CURRENT_YEAR = datetime.datetime.now().year
+
 # 支持多种日期格式的解析函数
 def parse_date_string(date_str):
     """
@@ -217,40 +324,28 @@ def parse_date_string(date_str):
     # 规范化日期字符串
     normalized = date_str.strip().replace('/', '-')
     
-    # 尝试多种日期格式
-    date_formats = [
-        '%Y-%m-%d %H:%M:%S',    # 2023-01-02 10:30:45
-        '%Y-%m-%d %H:%M',       # 2023-01-02 10:30
-        '%Y-%m-%d',             # 2023-01-02
-        '%y-%m-%d %H:%M:%S',    # 23-01-02 10:30:45
-        '%y-%m-%d %H:%M',       # 23-01-02 10:30
-        '%y-%m-%d',             # 23-01-02
-        '%m-%d %H:%M:%S',       # 01-02 10:30:45 (当前年份)
-        '%m-%d %H:%M'           # 01-02 10:30 (当前年份)
-    ]
+    # 最常见的 2023-01-02 10:30:45 格式直接按数字构造，不经过strptime
+    match = _DATE_STD_RE.fullmatch(normalized)
+    if match:
+        try:
+            return datetime.datetime(*map(int, match.groups()))
+        except ValueError:
+            pass
     
     # 尝试不同的格式
-    for fmt in date_formats:
+    for fmt in _DATE_FORMATS:
         try:
             dt = datetime.datetime.strptime(normalized, fmt)
             # 如果格式中没有年份，添加当前年份
             if '%y' not in fmt and '%Y' not in fmt:
-                current_year = datetime.datetime.now().year
-                dt = dt.replace(year=current_year)
+                dt = dt.replace(year=_CURRENT_YEAR)
             return dt
         except ValueError:
             continue
     
     # 如果以上格式都不匹配，尝试使用正则表达式提取
-    patterns = [
-        # 年-月-日 时:分:秒
-        r'(\d{2,4})[/-](\d{1,2})[/-](\d{1,2})[\s]+(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?',
-        # 月-日 时:分:秒 (当前年份)
-        r'(\d{1,2})[/-](\d{1,2})[\s]+(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, normalized)
+    for pattern in _DATE_FALLBACK_RES:
+        match = pattern.search(normalized)
         if match:
             try:
                 if len(match.groups()) >= 6:  # 年月日时分秒
@@ -265,13 +360,12 @@ def parse_date_string(date_str):
                     second = int(match.group(6)) if match.group(6) else 0
                     return datetime.datetime(year, month, day, hour, minute, second)
                 elif len(match.groups()) >= 5:  # 月日时分秒 (当前年份)
-                    current_year = datetime.datetime.now().year
                     month = int(match.group(1))
                     day = int(match.group(2))
                     hour = int(match.group(3))
                     minute = int(match.group(4))
                     second = int(match.group(5)) if len(match.groups()) >= 5 and match.group(5) else 0
-                    return datetime.datetime(current_year, month, day, hour, minute, second)
+                    return datetime.datetime(_CURRENT_YEAR, month, day, hour, minute, second)
             except (ValueError, IndexError) as e:
                 logger.debug(f"尝试使用正则解析日期 '{date_str}' 时出错: {e}")
                 continue
@@ -279,127 +373,450 @@ def parse_date_string(date_str):
     # 所有尝试都失败
     return None
 
+# 页面未修改（304）时get_page_content的返回值
+NOT_MODIFIED = object()
+
+# 条件请求缓存：{url: {'etag': ..., 'last_modified': ..., 'posts': [...], 'used': 最近使用的时间戳}}，在多次运行之间保存
+_HTTP_CACHE = {}
+
+def load_http_cache(path=HTTP_CACHE_FILE):
+    """读取上次运行保存的条件请求缓存"""
+    _HTTP_CACHE.clear()
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        _HTTP_CACHE.update(orjson.loads(data) if HAS_ORJSON else json.loads(data))
+        logger.debug(f"已从 {path} 读取 {len(_HTTP_CACHE)} 条页面缓存")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:  # orjson.JSONDecodeError是ValueError的子类
+        logger.warning(f"读取页面缓存 {path} 时出错，将重新抓取所有页面: {str(e)}")
+
+def save_http_cache(path=HTTP_CACHE_FILE):
+    """保存条件请求缓存，先写临时文件再替换，避免中断时留下损坏的缓存；长期未使用的页面不再保存"""
+    cutoff = time.time() - HTTP_CACHE_MAX_AGE_DAYS * 86400
+    for url in [url for url, entry in _HTTP_CACHE.items() if entry.get('used', 0) < cutoff]:
+        del _HTTP_CACHE[url]
+    tmp_path = f"{path}.tmp"
+    try:
+        if HAS_ORJSON:
+            data = orjson.dumps(_HTTP_CACHE)
+        else:
+            data = json.dumps(_HTTP_CACHE, ensure_ascii=False).encode('utf-8')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"保存页面缓存 {path} 时出错: {str(e)}")
+
+def conditional_headers(url):
+    """根据缓存中的ETag/Last-Modified生成条件请求头"""
+    entry = _HTTP_CACHE.get(url)
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def remember_page(url, response_headers, posts):
+    """记录页面的ETag/Last-Modified和解析出的帖子；服务器不支持条件请求或没有帖子时不缓存"""
+    etag = response_headers.get('ETag')
+    last_modified = response_headers.get('Last-Modified')
+    if not posts or not (etag or last_modified):
+        _HTTP_CACHE.pop(url, None)
+        return
+    _HTTP_CACHE[url] = {
+        'etag': etag,
+        'last_modified': last_modified,
+        'posts': [dict(post, date=post['date'].isoformat()) for post in posts],
+        'used': time.time(),
+    }
+
+def cached_posts(url):
+    """返回缓存中该页面的帖子，日期还原为datetime；没有缓存时返回None"""
+    entry = _HTTP_CACHE.get(url)
+    if entry is None:
+        return None
+    entry['used'] = time.time()
+    return [dict(post, date=datetime.datetime.fromisoformat(post['date'])) for post in entry['posts']]
+
+def posts_from_page(page, board_id, page_num, cutoff_date=None):
+    """
+    根据抓取结果得到页面上的帖子：页面未修改时直接使用缓存，否则解析页面并更新缓存
+    
+    Args:
+        page: get_page_content或异步抓取的返回值
+        board_id: 板块ID
+        page_num: 页码
+        cutoff_date: 截止日期，解析时跳过早于它的帖子
+        
+    Returns:
+        包含帖子信息的列表，每个帖子为一个字典
+    """
+    page_url = board_page_url(board_id, page_num)
+    if page is NOT_MODIFIED:
+        posts = cached_posts(page_url)
+        if posts is not None:
+            logger.debug(f"{page_url} 未修改，使用缓存的 {len(posts)} 条帖子")
+            return posts
+        logger.warning(f"{page_url} 返回未修改但缓存中没有该页面")
+        return []
+    if page is None:
+        logger.warning(f"未能获取 {page_url} 的页面内容")
+        return []
+    content, charset, response_headers = page
+    posts = parse_board_page_from_html(content, board_id, page_num, charset, cutoff_date)
+    remember_page(page_url, response_headers, posts)
+    return posts
+
+# 板块页面URL
+def board_page_url(board_id, page_num):
+    return f"{BASE_URL}index.asp?boardid={board_id}&page={page_num}"
+
 # Function to parse post details from a board page based on new DIV structure
-def parse_board_page(board_id, page_num):
+def parse_board_page(board_id, page_num, cutoff_date=None):
     """
-    解析指定板块页面上的所有帖子
+    抓取并解析指定板块页面上的所有帖子
     
     Args:
         board_id: 板块ID
         page_num: 页码
+        cutoff_date: 截止日期，早于它的帖子不放入结果；为None时保留所有帖子
         
     Returns:
         包含帖子信息的列表，每个帖子为一个字典
     """
-    page_url = f"{BASE_URL}index.asp?boardid={board_id}&page={page_num}"
+    page_url = board_page_url(board_id, page_num)
     logger.debug(f"正在抓取 {page_url}")
     
+    page = get_page_content(page_url, headers=conditional_headers(page_url))
+    return posts_from_page(page, board_id, page_num, cutoff_date)
+
+def parse_board_page_from_html(html, board_id, page_num, charset=None, cutoff_date=None):
+    """
+    解析已下载的板块页面HTML；安装了lxml时用预编译的XPath提取，否则使用BeautifulSoup
+    
+    Args:
+        html: 页面HTML的字节内容
+        board_id: 板块ID
+        page_num: 页码
+        charset: 响应头Content-Type中声明的字符集
+        cutoff_date: 截止日期，早于它的帖子不放入结果；为None时保留所有帖子
+        
+    Returns:
+        包含帖子信息的列表，每个帖子为一个字典
+    """
+    page_url = board_page_url(board_id, page_num)
     try:
-        soup = get_soup(page_url)
-        posts_data = []
+        if HAS_LXML:
+            tree = lxml_html.document_fromstring(html.decode(page_encoding(html, charset), errors='replace'))
+            post_nodes = _LIST_XP(tree)
+            extract_date, extract_fields, node_text = _extract_date_text_lxml, _extract_post_fields_lxml, _node_text
+        else:
+            soup = make_soup(html, charset)
+            post_nodes = soup.find_all('div', class_='list')
+            extract_date, extract_fields = _extract_date_text_bs4, _extract_post_fields_bs4
+            node_text = lambda node: node.get_text(strip=True)
+        return build_posts(post_nodes, extract_date, extract_fields, node_text, board_id, page_num, page_url, cutoff_date)
+    except Exception as e:
+        logger.error(f"解析板块 {board_id} 页面 {page_num} 时发生错误: {str(e)}")
+        return []
+
+def _has_class(name):
+    """XPath条件：class属性中包含指定类名"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# 预编译的XPath表达式，与BeautifulSoup版本的查找逻辑一一对应
+if HAS_LXML:
+    _LIST_XP = etree.XPath(f"//div[{_has_class('list')}]")
+    _TITLE_DIV_XP = etree.XPath(f".//div[{_has_class('listtitle')}]")
+    _TITLE_LINK_XP = etree.XPath(".//a[contains(@href, 'dispbbs.asp') and contains(@href, 'ID=')]")
+    _AUTHOR_DIV_XP = etree.XPath(f".//div[{_has_class('list_a')}]")
+    _COUNT_DIV_XP = etree.XPath(f".//div[{_has_class('list_c')}]")
+    _DATE_R1_XP = etree.XPath(f".//div[{_has_class('list_r1')}]")
+    _DATE_T_XP = etree.XPath(f".//div[{_has_class('list_t')}]")
+    _LINK_XP = etree.XPath(".//a")
+    _TEXT_XP = etree.XPath(".//text()")
+
+def _node_text(node):
+    """与BeautifulSoup的get_text(strip=True)一致：各段文本去除首尾空白后直接拼接"""
+    return "".join(text.strip() for text in _TEXT_XP(node))
 
-        if not soup:
-            logger.warning(f"未能获取 {page_url} 的页面内容")
-            return posts_data
+def _first(xpath, node):
+    """返回XPath匹配到的第一个元素，没有时返回None"""
+    if node is None:
+        return None
+    result = xpath(node)
+    return result[0] if result else None
 
-        # 查找所有包含帖子的div元素
-        post_divs = soup.find_all('div', class_='list')
+def _extract_date_text_lxml(post_node):
+    """用XPath从一个div.list中取出日期文本，没有日期链接时返回None"""
+    date_link = _first(_LINK_XP, _first(_DATE_T_XP, _first(_DATE_R1_XP, post_node)))
+    return _node_text(date_link) if date_link is not None else None
 
-        if not post_divs:
-            logger.warning(f"在 {page_url} 上未找到任何 <div class='list'> 元素。")
-            return posts_data
+def _extract_post_fields_lxml(post_node):
+    """
+    用XPath从一个div.list中取出日期以外的原始字段
+    
+    Returns:
+        (标题, 标题链接, 作者, 回复数/浏览量文本列表)
+    """
+    title_text = title_href = author = ""
+    title_link = _first(_TITLE_LINK_XP, _first(_TITLE_DIV_XP, post_node))
+    if title_link is not None:
+        title_text = _node_text(title_link)
+        title_href = title_link.get('href', '')
+    
+    author_link = _first(_LINK_XP, _first(_AUTHOR_DIV_XP, post_node))
+    if author_link is not None:
+        author = _node_text(author_link)
+    
+    count_texts = [_node_text(div) for div in _COUNT_DIV_XP(post_node)[:2]]
+    return title_text, title_href, author, count_texts
+
+# 标题链接：href中同时包含dispbbs.asp和ID=（与XPath版本的条件一致）
+_TITLE_HREF_RE = re.compile(r'^(?=.*dispbbs\.asp)(?=.*ID=)', re.DOTALL)
+
+def _extract_date_text_bs4(post_div):
+    """用BeautifulSoup从一个div.list中取出日期文本，没有日期链接时返回None"""
+    list_r1_div = post_div.find('div', class_='list_r1')
+    if list_r1_div:
+        date_div = list_r1_div.find('div', class_='list_t')
+        if date_div:
+            date_link = date_div.find('a')
+            if date_link:
+                return date_link.get_text(strip=True)
+    return None
+
+def _extract_post_fields_bs4(post_div):
+    """
+    用BeautifulSoup从一个div.list中取出日期以外的原始字段（未安装lxml时使用）
+    
+    Returns:
+        (标题, 标题链接, 作者, 回复数/浏览量文本列表)
+    """
+    title_text = title_href = author = ""
+    
+    title_div = post_div.find('div', class_='listtitle')
+    if title_div:
+        title_link = title_div.find('a', href=_TITLE_HREF_RE)
+        if title_link:
+            title_text = title_link.get_text(strip=True)
+            title_href = title_link.get('href', '')
+
+    author_div = post_div.find('div', class_='list_a')
+    if author_div and author_div.find('a'):
+        author = author_div.find('a').get_text(strip=True)
+
+    count_texts = [div.get_text(strip=True) for div in post_div.find_all('div', class_='list_c')[:2]]
+    return title_text, title_href, author, count_texts
+
+def build_posts(post_nodes, extract_date, extract_fields, node_text, board_id, page_num, page_url, cutoff_date=None):
+    """
+    从页面上所有div.list节点中提取帖子
+    
+    每个帖子先取日期，早于截止日期的帖子不再提取其余字段，也不放入结果；
+    页面上可能有置顶的旧帖，因此只跳过单个帖子，不在遇到旧帖时停止解析整页
+    
+    Args:
+        post_nodes: div.list节点列表
+        extract_date: 从单个节点取出日期文本的函数
+        extract_fields: 从单个节点取出日期以外原始字段的函数
+        node_text: 获取节点文本的函数，用于日志
+        board_id: 板块ID
+        page_num: 页码
+        page_url: 页面URL，用于日志
+        cutoff_date: 截止日期，为None时保留所有帖子
         
-        logger.debug(f"在 {page_url} 上找到 {len(post_divs)} 个 <div class='list'> 元素")
+    Returns:
+        包含帖子信息的列表，每个帖子为一个字典
+    """
+    posts_data = []
+    skipped_old = 0
 
-        for idx, post_div in enumerate(post_divs):
-            try:
-                title_text = ""
-                post_datetime = None
-                author = ""
-                post_id = ""
-                replies = 0
-                views = 0
-
-                # 从帖子中提取标题和帖子ID
-                title_div = post_div.find('div', class_='listtitle')
-                if title_div:
-                    title_link = title_div.find('a', href=lambda href: href and 'dispbbs.asp' in href and 'ID=' in href)
-                    if title_link:
-                        title_text = title_link.get_text(strip=True)
-                        
-                        # 提取帖子ID
-                        if 'href' in title_link.attrs:
-                            id_match = re.search(r'ID=(\d+)', title_link['href'], re.IGNORECASE)
-                            if id_match:
-                                post_id = id_match.group(1)
-
-                # 从帖子中提取作者
-                author_div = post_div.find('div', class_='list_a')
-                if author_div and author_div.find('a'):
-                    author = author_div.find('a').get_text(strip=True)
-
-                # 提取回复数和浏览量
-                list_c_divs = post_div.find_all('div', class_='list_c')
-                if len(list_c_divs) >= 2:
-                    try:
-                        replies = int(list_c_divs[0].get_text(strip=True))
-                        views = int(list_c_divs[1].get_text(strip=True))
-                    except (ValueError, IndexError) as e:
-                        logger.debug(f"解析回复数或浏览量时出错: {str(e)}")
-
-                # 从帖子中提取日期
-                list_r1_div = post_div.find('div', class_='list_r1')
-                if list_r1_div:
-                    date_div = list_r1_div.find('div', class_='list_t')
-                    if date_div:
-                        date_link = date_div.find('a')
-                        if date_link:
-                            date_str_candidate = date_link.get_text(strip=True)
-                            # 首先尝试使用标准正则提取日期部分
-                            date_match = re.search(r'(\d{4}[/-]\d{1,2}[/-]\d{1,2}\s+\d{1,2}:\d{1,2}:\d{1,2})', date_str_candidate)
-                            if date_match:
-                                parsed_date_str = date_match.group(1)
-                                post_datetime = parse_date_string(parsed_date_str)
-                            else:
-                                # 如果标准格式不匹配，尝试直接解析整个字符串
-                                post_datetime = parse_date_string(date_str_candidate)
-                                
-                            if post_datetime is None:
-                                logger.error(f"无法解析日期字符串: '{date_str_candidate}' 在 {page_url}")
-                
-                if title_text and post_datetime:
-                    post_data = {
-                        'title': title_text,
-                        'date': post_datetime,
-                        'board_id': board_id,
-                        'page': page_num,
-                        'author': author,
-                        'replies': replies,
-                        'views': views,
-                        'post_id': post_id
-                    }
-                    logger.debug(f"提取的帖子: 板块={board_id}, ID={post_id}, 标题='{title_text}', 作者='{author}', 回复数={replies}, 浏览量={views}, 日期='{post_datetime}'")
-                    posts_data.append(post_data)
+    if not post_nodes:
+        logger.warning(f"在 {page_url} 上未找到任何 <div class='list'> 元素。")
+        return posts_data
+    
+    logger.debug(f"在 {page_url} 上找到 {len(post_nodes)} 个 <div class='list'> 元素")
+
+    for idx, post_node in enumerate(post_nodes):
+        try:
+            post_datetime = None
+            post_id = ""
+            replies = 0
+            views = 0
+
+            # 从帖子中提取日期
+            date_str_candidate = extract_date(post_node)
+            if date_str_candidate is not None:
+                # 首先尝试使用标准正则提取日期部分
+                date_match = _DATE_STD_RE.search(date_str_candidate)
+                if date_match:
+                    parsed_date_str = date_match.group(0)
+                    post_datetime = parse_date_string(parsed_date_str)
                 else:
-                    if not title_text: 
-                        logger.debug(f"在 {page_url} 的第 {idx+1} 个 div.list 中缺少标题。内容: {post_div.get_text(strip=True)[:100]}")
-                    if not post_datetime: 
-                        logger.debug(f"在 {page_url} 的第 {idx+1} 个 div.list 中缺少日期。内容: {post_div.get_text(strip=True)[:100]}")
-            except Exception as e:
-                logger.error(f"处理 {page_url} 上的第 {idx+1} 个帖子时出错: {str(e)}")
+                    # 如果标准格式不匹配，尝试直接解析整个字符串
+                    post_datetime = parse_date_string(date_str_candidate)
+                    
+                if post_datetime is None:
+                    logger.error(f"无法解析日期字符串: '{date_str_candidate}' 在 {page_url}")
+            
+            # 早于截止日期的帖子不会被采用，跳过其余字段的提取
+            if cutoff_date is not None and post_datetime is not None and post_datetime < cutoff_date:
+                skipped_old += 1
                 continue
 
-        if not posts_data and page_num == 1:
-            logger.info(f"使用基于div的解析逻辑从板块ID: {board_id}, 页面: 1, URL: {page_url} 未提取到任何帖子。")
-        return posts_data
-    except Exception as e:
-        logger.error(f"解析板块 {board_id} 页面 {page_num} 时发生错误: {str(e)}")
-        return []
+            title_text, title_href, author, count_texts = extract_fields(post_node)
+
+            # 提取帖子ID
+            if title_href:
+                id_match = _ID_RE.search(title_href)
+                if id_match:
+                    post_id = id_match.group(1)
+
+            # 提取回复数和浏览量
+            if len(count_texts) >= 2:
+                try:
+                    replies = int(count_texts[0])
+                    views = int(count_texts[1])
+                except (ValueError, IndexError) as e:
+                    logger.debug(f"解析回复数或浏览量时出错: {str(e)}")
+            
+            if title_text and post_datetime:
+                post_data = {
+                    'title': title_text,
+                    'date': post_datetime,
+                    'board_id': board_id,
+                    'page': page_num,
+                    'author': author,
+                    'replies': replies,
+                    'views': views,
+                    'post_id': post_id
+                }
+                logger.debug(f"提取的帖子: 板块={board_id}, ID={post_id}, 标题='{title_text}', 作者='{author}', 回复数={replies}, 浏览量={views}, 日期='{post_datetime}'")
+                posts_data.append(post_data)
+            else:
+                if not title_text: 
+                    logger.debug(f"在 {page_url} 的第 {idx+1} 个 div.list 中缺少标题。内容: {node_text(post_node)[:100]}")
+                if not post_datetime: 
+                    logger.debug(f"在 {page_url} 的第 {idx+1} 个 div.list 中缺少日期。内容: {node_text(post_node)[:100]}")
+        except Exception as e:
+            logger.error(f"处理 {page_url} 上的第 {idx+1} 个帖子时出错: {str(e)}")
+            continue
+
+    if skipped_old:
+        logger.debug(f"{page_url} 上有 {skipped_old} 条早于截止日期的帖子，已跳过")
+    elif not posts_data and page_num == 1:
+        logger.info(f"使用基于div的解析逻辑从板块ID: {board_id}, 页面: 1, URL: {page_url} 未提取到任何帖子。")
+    return posts_data
+
+def collect_board_posts(board_id, pages, cutoff_date):
+    """
+    按页码顺序筛选一个板块中截止日期之后的帖子
+    
+    页面解析时已跳过早于截止日期的帖子，此处仍按日期筛选，兼容未按截止日期解析的页面（如缓存的帖子）
+    
+    Args:
+        board_id: 板块ID
+        pages: 按页码顺序产生(页码, 帖子列表)的可迭代对象，可以是边抓取边产生的生成器
+        cutoff_date: 截止日期
+        
+    Returns:
+        该板块最近帖子的列表
+    """
+    recent_posts = []
+    for page_num, posts_on_page in pages:
+        try:
+            if not posts_on_page and page_num == 1:
+                logger.info(f"在板块ID: {board_id} 的第一页未找到帖子。转到下一个板块。")
+                break 
+            if not posts_on_page:
+                logger.info(f"在板块ID: {board_id}, 页面: {page_num} 上未找到截止日期之后的帖子。")
+                break
+
+            current_page_had_recent = False
+            oldest_post_on_page = None
+
+            for post in posts_on_page:
+                if oldest_post_on_page is None or post['date'] < oldest_post_on_page['date']:
+                    oldest_post_on_page = post
+                
+                if post['date'] >= cutoff_date:
+                    recent_posts.append(post)
+                    current_page_had_recent = True
+            
+            if oldest_post_on_page and oldest_post_on_page['date'] < cutoff_date and not current_page_had_recent:
+                logger.info(f"板块 {board_id} 页面 {page_num} 上最旧的帖子(日期: {oldest_post_on_page['date']})早于截止日期({cutoff_date.strftime('%Y-%m-%d')})且此页上没有最近的帖子。停止抓取此板块。")
+                break
+        except Exception as e:
+            logger.error(f"处理板块 {board_id} 页面 {page_num} 时出错: {str(e)}")
+            continue
+    return recent_posts
+
+def _fetch_page_after_delay(page_url, delay, stop):
+    """等待delay秒后抓取页面；等待期间板块已停止抓取时不再发出请求"""
+    if stop.wait(delay):
+        return None
+    return get_page_content(page_url, headers=conditional_headers(page_url))
+
+def _fetch_board_pages(board_id, executor, cutoff_date=None):
+    """
+    依次抓取并解析板块的各页，产生(页码, 帖子列表)
+    
+    解析当前页的同时，下一页已在后台线程中（随机延迟后）抓取，页面间的延迟与解析时间重叠；
+    请求仍是逐个发出的，调用方提前停止时未发出的下一页请求会被取消
+    """
+    stop = threading.Event()
+    future = executor.submit(_fetch_page_after_delay, board_page_url(board_id, 1), 0, stop)
+    try:
+        for page_num in range(1, PAGES_PER_BOARD + 1):  # 检查每个板块的前几页
+            logger.info(f"正在抓取板块ID: {board_id}, 页面: {page_num}")
+            page = future.result()
+            
+            if page_num < PAGES_PER_BOARD:
+                # 随机化延迟，避免被检测到爬虫行为
+                delay_time = PAGE_DELAY_MIN + random.random() * (PAGE_DELAY_MAX - PAGE_DELAY_MIN)
+                logger.debug(f"等待 {delay_time:.2f} 秒...")
+                future = executor.submit(_fetch_page_after_delay, board_page_url(board_id, page_num + 1), delay_time, stop)
+            
+            yield page_num, posts_from_page(page, board_id, page_num, cutoff_date)
+    finally:
+        stop.set()
 
 # Function to scrape recent posts from multiple boards
 def scrape_recent_posts(board_ids=TARGET_BOARD_IDS, days_limit=DAYS_LIMIT):
     """
-    从多个板块抓取最近的帖子
+    从多个板块抓取最近的帖子，安装了aiohttp时并发抓取，否则逐页顺序抓取
+    
+    Args:
+        board_ids: 要抓取的板块ID列表
+        days_limit: 抓取多少天内的帖子
+        
+    Returns:
+        包含最近帖子信息的列表
+    """
+    global _CURRENT_YEAR
+    _CURRENT_YEAR = datetime.datetime.now().year
+    # 每次抓取使用同一个User-Agent，同步和异步抓取都从会话中读取
+    _SESSION.headers['User-Agent'] = get_random_user_agent()
+    load_http_cache()
+    try:
+        if HAS_AIOHTTP:
+            try:
+                return asyncio.run(scrape_recent_posts_async(board_ids, days_limit))
+            except Exception as e:
+                logger.critical(f"抓取过程中发生严重错误: {str(e)}")
+                return []
+        return scrape_recent_posts_sync(board_ids, days_limit)
+    finally:
+        save_http_cache()
+
+def scrape_recent_posts_sync(board_ids=TARGET_BOARD_IDS, days_limit=DAYS_LIMIT):
+    """
+    逐个板块、逐页顺序抓取最近的帖子
     
     Args:
         board_ids: 要抓取的板块ID列表
@@ -412,47 +829,13 @@ def scrape_recent_posts(board_ids=TARGET_BOARD_IDS, days_limit=DAYS_LIMIT):
     cutoff_date = datetime.datetime.now() - datetime.timedelta(days=days_limit)
     logger.info(f"开始抓取最近 {days_limit} 天内的帖子，截止日期: {cutoff_date.strftime('%Y-%m-%d')}")
 
+    # 单个后台线程负责抓取，主线程解析，两者流水线式重叠
+    executor = ThreadPoolExecutor(max_workers=1)
     try:
         for board_id in board_ids:
             try:
                 logger.info(f"\n处理板块ID: {board_id}")
-                page_had_recent_posts_ever_for_this_board = False
-                
-                for page_num in range(1, PAGES_PER_BOARD + 1):  # 检查每个板块的前几页
-                    try:
-                        logger.info(f"正在抓取板块ID: {board_id}, 页面: {page_num}")
-                        posts_on_page = parse_board_page(board_id, page_num)
-                        
-                        # 随机化延迟，避免被检测到爬虫行为
-                        delay_time = PAGE_DELAY_MIN + random.random() * (PAGE_DELAY_MAX - PAGE_DELAY_MIN)
-                        logger.debug(f"等待 {delay_time:.2f} 秒...")
-                        time.sleep(delay_time)
-                        
-                        if not posts_on_page and page_num == 1:
-                            logger.info(f"在板块ID: {board_id} 的第一页未找到帖子。转到下一个板块。")
-                            break 
-                        if not posts_on_page:
-                            logger.info(f"在板块ID: {board_id}, 页面: {page_num} 上未找到更多帖子。")
-                            break
-
-                        current_page_had_recent = False
-                        oldest_post_on_page = None
-
-                        for post in posts_on_page:
-                            if oldest_post_on_page is None or post['date'] < oldest_post_on_page['date']:
-                                oldest_post_on_page = post
-                            
-                            if post['date'] >= cutoff_date:
-                                all_recent_posts.append(post)
-                                current_page_had_recent = True
-                                page_had_recent_posts_ever_for_this_board = True
-                        
-                        if oldest_post_on_page and oldest_post_on_page['date'] < cutoff_date and not current_page_had_recent:
-                            logger.info(f"板块 {board_id} 页面 {page_num} 上最旧的帖子(日期: {oldest_post_on_page['date']})早于截止日期({cutoff_date.strftime('%Y-%m-%d')})且此页上没有最近的帖子。停止抓取此板块。")
-                            break
-                    except Exception as e:
-                        logger.error(f"处理板块 {board_id} 页面 {page_num} 时出错: {str(e)}")
-                        continue
+                all_recent_posts.extend(collect_board_posts(board_id, _fetch_board_pages(board_id, executor, cutoff_date), cutoff_date))
                 
                 # 板块之间使用更长的随机延迟
                 board_delay = BOARD_DELAY_MIN + random.random() * (BOARD_DELAY_MAX - BOARD_DELAY_MIN)
@@ -467,6 +850,158 @@ def scrape_recent_posts(board_ids=TARGET_BOARD_IDS, days_limit=DAYS_LIMIT):
     except Exception as e:
         logger.critical(f"抓取过程中发生严重错误: {str(e)}")
         return all_recent_posts
+    finally:
+        executor.shutdown(wait=True)
+
+async def _fetch_with_retry(session, url):
+    """
+    异步获取页面，带有重试和错误处理机制
+    
+    Returns:
+        (页面的字节内容, 响应头声明的字符集, 响应头)，页面未修改时返回NOT_MODIFIED，请求失败时返回None
+    """
+    headers = conditional_headers(url)
+    backoff_time = 2  # 初始等待时间，秒
+    for retry_count in range(MAX_RETRIES + 1):
+        if retry_count:
+            wait_time = backoff_time * (2 ** (retry_count - 1)) * (0.5 + random.random())  # 指数退避加随机抖动
+            logger.info(f"等待 {wait_time:.2f} 秒后重试 {url} ({retry_count}/{MAX_RETRIES})...")
+            await asyncio.sleep(wait_time)
+        try:
+            async with session.get(url, headers=headers) as response:
+                logger.debug(f"收到 URL {url} 的响应，状态码: {response.status}")
+                if response.status == 200:
+                    return await response.read(), response.charset, response.headers
+                if response.status == 304:
+                    return NOT_MODIFIED
+                logger.warning(f"错误: 从 URL 获取到状态码 {response.status}: {url}")
+                if response.status not in RETRY_STATUS_CODES:
+                    return None
+        except asyncio.TimeoutError:
+            logger.warning(f"请求 URL {url} 超时")
+        except aiohttp.ClientError as e:
+            logger.warning(f"获取 URL {url} 时出错: {str(e)}")
+    logger.error(f"在 {MAX_RETRIES} 次尝试后放弃请求 {url}")
+    return None
+
+async def fetch(session, url, sem):
+    """在并发上限内获取页面；占用名额期间随机等待，控制对站点的请求频率"""
+    async with sem:
+        try:
+            return await _fetch_with_retry(session, url)
+        finally:
+            await asyncio.sleep(PAGE_DELAY_MIN + random.random() * (PAGE_DELAY_MAX - PAGE_DELAY_MIN))
+
+def _parse_executor(page_count):
+    """页面较多且有多个CPU时创建解析页面用的进程池，否则返回None（在当前进程中解析）"""
+    if PARSE_PROCESSES < 2 or page_count < PROCESS_PARSE_MIN_PAGES:
+        return None
+    try:
+        return ProcessPoolExecutor(max_workers=PARSE_PROCESSES)
+    except (OSError, NotImplementedError) as e:
+        logger.warning(f"无法创建解析进程池，将在当前进程中解析: {str(e)}")
+        return None
+
+async def _posts_from_page_async(page, board_id, page_num, cutoff_date, executor):
+    """与posts_from_page相同，但需要解析的页面交给进程池，多个页面的解析可同时使用多个CPU"""
+    if executor is None or page is None or page is NOT_MODIFIED:
+        return posts_from_page(page, board_id, page_num, cutoff_date)
+    content, charset, response_headers = page
+    try:
+        posts = await asyncio.get_running_loop().run_in_executor(
+            executor, parse_board_page_from_html, content, board_id, page_num, charset, cutoff_date
+        )
+    except Exception as e:
+        # parse_board_page_from_html自身不抛出异常，这里是进程池本身的问题（如工作进程异常退出）
+        logger.warning(f"进程池解析板块 {board_id} 页面 {page_num} 失败，改为在当前进程中解析: {str(e)}")
+        return posts_from_page(page, board_id, page_num, cutoff_date)
+    remember_page(board_page_url(board_id, page_num), response_headers, posts)
+    return posts
+
+async def scrape_recent_posts_async(board_ids=TARGET_BOARD_IDS, days_limit=DAYS_LIMIT):
+    """
+    并发抓取所有板块的各页，再按板块和页码顺序筛选最近的帖子
+    
+    Args:
+        board_ids: 要抓取的板块ID列表
+        days_limit: 抓取多少天内的帖子
+        
+    Returns:
+        包含最近帖子信息的列表
+    """
+    cutoff_date = datetime.datetime.now() - datetime.timedelta(days=days_limit)
+    logger.info(f"开始并发抓取最近 {days_limit} 天内的帖子，截止日期: {cutoff_date.strftime('%Y-%m-%d')}")
+
+    page_keys = [(board_id, page_num) for board_id in board_ids for page_num in range(1, PAGES_PER_BOARD + 1)]
+    sem = asyncio.Semaphore(CONCURRENT_REQUESTS)
+    connector = aiohttp.TCPConnector(limit=CONCURRENT_REQUESTS, limit_per_host=CONCURRENT_REQUESTS, use_dns_cache=True, ttl_dns_cache=DNS_CACHE_TTL)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    # aiohttp与urllib3依赖的解压库不同，按aiohttp实际能解压的格式声明
+    supported = {'gzip', 'deflate'}
+    if getattr(aiohttp_compression, 'HAS_BROTLI', False):
+        supported.add('br')
+    if getattr(aiohttp_compression, 'HAS_ZSTD', False):
+        supported.add('zstd')
+    headers = {**COMMON_HEADERS, 'Accept-Encoding': accept_encoding(supported), 'User-Agent': _SESSION.headers['User-Agent']}
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+        pages = await asyncio.gather(
+            *(fetch(session, board_page_url(board_id, page_num), sem) for board_id, page_num in page_keys),
+            return_exceptions=True
+        )
+
+    for i, ((board_id, page_num), page) in enumerate(zip(page_keys, pages)):
+        if isinstance(page, BaseException):
+            logger.error(f"抓取板块 {board_id} 页面 {page_num} 时出错: {str(page)}")
+            pages[i] = None
+
+    # 所有页面下载完成后再解析，页面较多时由进程池并行解析
+    executor = _parse_executor(len(page_keys))
+    try:
+        posts_per_page = await asyncio.gather(*(
+            _posts_from_page_async(page, board_id, page_num, cutoff_date, executor)
+            for (board_id, page_num), page in zip(page_keys, pages)
+        ))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    pages_by_board = {}
+    for (board_id, page_num), posts_on_page in zip(page_keys, posts_per_page):
+        pages_by_board.setdefault(board_id, []).append((page_num, posts_on_page))
+
+    all_recent_posts = []
+    for board_id, pages in pages_by_board.items():
+        logger.info(f"\n处理板块ID: {board_id}")
+        all_recent_posts.extend(collect_board_posts(board_id, pages, cutoff_date))
+
+    logger.info(f"抓取完成，共找到 {len(all_recent_posts)} 条最近 {days_limit} 天内的帖子")
+    return all_recent_posts
+
+def write_posts_tsv(posts, path=OUTPUT_FILENAME):
+    """
+    将帖子写入TSV文件（UTF-8 BOM；含制表符、换行或引号的字段按csv规则加引号，与ai.py的读取方式一致）
+    
+    Args:
+        posts: 帖子字典列表
+        path: 输出文件路径
+    """
+    with open(path, 'w', newline='', encoding='utf-8-sig', buffering=1 << 16) as tsvfile:
+        writer = csv.writer(tsvfile, delimiter='\t', lineterminator='\n')
+        writer.writerow(TSV_FIELDS)
+        writer.writerows(
+            (
+                post['board_id'],
+                BOARD_ID_NAME_MAP.get(str(post['board_id']), str(post['board_id'])),
+                post['page'],
+                post['post_id'],
+                post['title'],
+                post['author'],
+                post['date'].strftime('%Y-%m-%d %H:%M:%S'),
+                post['replies'],
+                post['views'],
+            )
+            for post in posts
+        )
 
 if __name__ == '__main__':
     try:
@@ -479,16 +1014,7 @@ if __name__ == '__main__':
             for post in recent_posts_sorted:
                 logger.info(f"标题: {post['title']} | 作者: {post['author']} | 日期: {post['date'].strftime('%Y-%m-%d %H:%M:%S')} | 板块: {post['board_id']} | 回复/浏览: {post['replies']}/{post['views']}")
             try:
-                with open(OUTPUT_FILENAME, 'w', newline='', encoding='utf-8-sig') as tsvfile:
-                    fieldnames = ['board_id', 'board_name', 'page', 'post_id', 'title', 'author', 'date', 'replies', 'views']
-                    writer = csv.DictWriter(tsvfile, fieldnames=fieldnames, delimiter='\t')
-                    writer.writeheader()
-                    for post_data in recent_posts_sorted:
-                        post_data_tsv = post_data.copy()
-                        post_data_tsv['date'] = post_data['date'].strftime('%Y-%m-%d %H:%M:%S')
-                        board_id_str = str(post_data_tsv['board_id'])
-                        post_data_tsv['board_name'] = BOARD_ID_NAME_MAP.get(board_id_str, board_id_str)
-                        writer.writerow(post_data_tsv)
+                write_posts_tsv(recent_posts_sorted)
                 logger.info(f"\n结果已保存到 {OUTPUT_FILENAME}")
             except Exception as e:
                 logger.error(f"保存TSV文件时出错: {str(e)}")